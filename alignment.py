@@ -0,0 +1,130 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import heapq
+from itertools import groupby
+from operator import itemgetter
+
+
+class VariantTimeline(object):
+    """
+    What the alignment check needs to know about one variant: the PTS of the
+    first frame of each analyzed segment, keyed by segment index, the PTS of
+    its keyframes and whether each segment starts with a keyframe. Times are
+    90 kHz ticks.
+    """
+
+    def __init__(self, name, boundaries, keyframes=(), starts_with_keyframe=None):
+        self.name = name
+        # Sorted (segment index, first frame PTS) index
+        self.boundaries = sorted(boundaries.items())
+        self.keyframes = sorted(keyframes)
+        self.starts_with_keyframe = starts_with_keyframe or {}
+
+
+class AlignmentReport(object):
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.segments_checked = 0
+        # (segment index, reference variant, variant, reference PTS, PTS)
+        self.misaligned = []
+        # (segment index, variant) for segments some variants have and others lack
+        self.missing = []
+        # variant -> segment indexes that do not start with a keyframe
+        self.segments_without_keyframe = {}
+        # variant -> keyframes of the reference variant with no keyframe
+        # within tolerance in this variant (and the other way round)
+        self.keyframe_mismatches = {}
+        self.keyframe_reference = None
+
+    @property
+    def ok(self):
+        return not (self.misaligned or self.missing or self.segments_without_keyframe or self.keyframe_mismatches)
+
+
+def check_alignment(timelines, tolerance=0):
+    """
+    Check segment boundaries and keyframe placement across `timelines`
+    (VariantTimeline), allowing boundaries to differ by up to `tolerance`
+    ticks.
+
+    The per-variant boundary indexes are merged by segment index in a single
+    pass. At each segment the boundary PTS values are clustered within the
+    tolerance; variants outside the largest cluster are reported against a
+    variant inside it, so one outlier rendition produces one finding rather
+    than one per pair. Keyframe positions are compared against the variant
+    with the most keyframes with a two-pointer walk, over the time range all
+    variants cover. Work is O(variants x segments) plus the keyframe walks.
+    """
+    report = AlignmentReport(tolerance)
+    if not timelines:
+        return report
+
+    streams = [_tagged(timeline.boundaries, n) for n, timeline in enumerate(timelines)]
+    for index, group in groupby(heapq.merge(*streams), key=itemgetter(0)):
+        values = sorted((pts, n) for _, pts, n in group)
+        report.segments_checked += 1
+
+        if len(values) < len(timelines):
+            present = set(n for _, n in values)
+            for n, timeline in enumerate(timelines):
+                if n not in present:
+                    report.missing.append((index, timeline.name))
+
+        if len(values) < 2 or values[-1][0] - values[0][0] <= tolerance:
+            continue
+
+        clusters = [[values[0]]]
+        for value in values[1:]:
+            if value[0] - clusters[-1][0][0] > tolerance:
+                clusters.append([])
+            clusters[-1].append(value)
+        reference = max(clusters, key=lambda cluster: (len(cluster), -min(n for _, n in cluster)))
+        referencePts, referenceN = min(reference, key=itemgetter(1))
+        for cluster in clusters:
+            if cluster is reference:
+                continue
+            for pts, n in cluster:
+                report.misaligned.append((index, timelines[referenceN].name, timelines[n].name, referencePts, pts))
+
+    for timeline in timelines:
+        missing = [index for index, starts in sorted(timeline.starts_with_keyframe.items()) if not starts]
+        if missing:
+            report.segments_without_keyframe[timeline.name] = missing
+
+    with_keyframes = [timeline for timeline in timelines if timeline.keyframes]
+    if len(with_keyframes) > 1:
+        start = max(timeline.keyframes[0] for timeline in with_keyframes) - tolerance
+        end = min(timeline.keyframes[-1] for timeline in with_keyframes) + tolerance
+        reference = max(with_keyframes, key=lambda timeline: len(timeline.keyframes))
+        report.keyframe_reference = reference.name
+        for timeline in with_keyframes:
+            if timeline is reference:
+                continue
+            unmatched = _count_unmatched(reference.keyframes, timeline.keyframes, tolerance, start, end)
+            unmatched += _count_unmatched(timeline.keyframes, reference.keyframes, tolerance, start, end)
+            if unmatched:
+                report.keyframe_mismatches[timeline.name] = unmatched
+
+    return report
+
+
+def _tagged(boundaries, n):
+    for index, pts in boundaries:
+        yield index, pts, n
+
+
+def _count_unmatched(positions, others, tolerance, start, end):
+    """Positions in [start, end] with no entry of `others` (sorted) within `tolerance`."""
+    unmatched = 0
+    j = 0
+    for position in positions:
+        if position < start or position > end:
+            continue
+        while j < len(others) and others[j] < position - tolerance:
+            j += 1
+        if j == len(others) or others[j] > position + tolerance:
+            unmatched += 1
+    return unmatched
@@ -0,0 +1,991 @@
+# coding: utf-8
+# Copyright 2014 jeoliva author. All rights reserved.
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import io
+import logging
+import time
+from urllib.parse import urljoin, urlparse
+
+import m3u8
+from m3u8.parser import is_url
+from fetcher import Fetcher
+from ts_segment import TSSegmentParser
+from parsers.paramsetcache import ParameterSetCache
+from parsers.timestamp import TIMESCALE, TimestampUnwrapper, ticksToSeconds
+from ts_packets import PCR_CLOCK, MAX_PCR_INTERVAL
+from videoframesinfo import VideoFrameInfo
+from alignment import VariantTimeline, check_alignment
+from sampling import SegmentSampler
+from nettiming import NetworkTimings
+
+
+class AnalysisContext(object):
+    """
+    State of a single analysis run.
+
+    Everything that used to live in module globals of hls-analyzer.py is kept
+    here so that several runs can share one process (and one Fetcher).
+    """
+
+    def __init__(self, url, fetcher, segments=1, frame_info_len=30, out=None,
+                 segment_cache=None, playlist_cache=None, quick=False, parameter_sets=None,
+                 alignment_tolerance=0, sampler=None, store=None):
+        self.url = url
+        self.base_url = url
+        self.fetcher = fetcher
+        self.segment_cache = segment_cache
+        self.playlist_cache = playlist_cache
+        self.parameter_sets = parameter_sets if parameter_sets is not None else ParameterSetCache()
+        self.quick = quick
+        # Largest difference, in 90 kHz ticks, between segment boundaries or
+        # keyframes of two variants that still counts as aligned
+        self.alignment_tolerance = alignment_tolerance
+        self.sampler = sampler if sampler is not None else SegmentSampler()
+        # Segment indexes chosen for the first variant, reused by the others
+        # when the sampler shares them
+        self.sampled_segments = None
+        # Timing of every HTTP request made for this run
+        self.timings = NetworkTimings()
+        # Optional store.ResultStore; segments already in it are not analyzed again
+        self.store = store
+        self.num_segments_to_analyze_per_playlist = segments
+        self.max_frames_to_show = frame_info_len
+        self.out = out if out is not None else io.StringIO()
+        self.videoFramesInfoDict = {}
+        self.warnings = []
+        self.captions_detected = []
+        self.subtitle_issues = []
+        self.is_variant = False
+
+    def print(self, *args, **kwargs):
+        kwargs.setdefault('file', self.out)
+        print(*args, **kwargs)
+
+    def log_warning(self, message):
+        self.warnings.append(message)
+        logging.warning(message)  # Log to file
+        self.print(f"Warning: {message}")  # Print to console
+
+
+class AnalysisResult(object):
+    """
+    Outcome of HLSAnalyzer.analyze(). `error` is set when the run could not
+    complete; partial variant information is kept in that case.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.is_variant = False
+        self.variants = {}
+        self.warnings = []
+        self.captions = []
+        self.subtitle_issues = []
+        self.error = None
+        self.elapsed = 0.0
+        self.report = None
+        self.network = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'ok': self.ok,
+            'error': self.error,
+            'is_variant': self.is_variant,
+            'elapsed': round(self.elapsed, 3),
+            'variants': {str(bw): vf.to_dict() for bw, vf in self.variants.items()},
+            'warnings': list(self.warnings),
+            'captions': list(self.captions),
+            'subtitle_issues': list(self.subtitle_issues),
+            'network': self.network.to_dict() if self.network is not None else None,
+        }
+
+
+class HLSAnalyzer(object):
+    """
+    Reusable entry point for analyzing HLS streams.
+
+    One instance can analyze any number of streams, from several threads at
+    once; per-stream state lives in an AnalysisContext created by analyze(),
+    while the Fetcher (and with it the HTTP connection pool), the parsed
+    parameter sets and the optional segment cache are shared between runs.
+
+        analyzer = HLSAnalyzer(segments=2)
+        result = analyzer.analyze("https://example.com/master.m3u8")
+        print(result.to_dict())
+    """
+
+    def __init__(self, segments=1, frame_info_len=30, fetcher=None, segment_cache=None,
+                 playlist_cache=None, quick=False, parameter_sets=None, alignment_tolerance=0,
+                 sampler=None, store=None):
+        self.segments = segments
+        self.frame_info_len = frame_info_len
+        self.fetcher = fetcher or Fetcher()
+        self.segment_cache = segment_cache
+        self.playlist_cache = playlist_cache
+        self.parameter_sets = parameter_sets if parameter_sets is not None else ParameterSetCache()
+        self.quick = quick
+        self.alignment_tolerance = alignment_tolerance
+        self.sampler = sampler
+        self.store = store
+
+    def create_context(self, url, out=None, segments=None, quick=None):
+        return AnalysisContext(url, self.fetcher,
+                               segments=self.segments if segments is None else segments,
+                               frame_info_len=self.frame_info_len, out=out,
+                               segment_cache=self.segment_cache,
+                               playlist_cache=self.playlist_cache,
+                               quick=self.quick if quick is None else quick,
+                               parameter_sets=self.parameter_sets,
+                               alignment_tolerance=self.alignment_tolerance,
+                               sampler=self.sampler,
+                               store=self.store)
+
+    def analyze(self, url, out=None, segments=None, quick=None):
+        """
+        Analyze the stream at `url` and return an AnalysisResult.
+
+        The human readable report is written to `out` when given, otherwise it
+        is collected in `result.report`. `segments` and `quick` override the
+        analyzer defaults for this run only. Quick runs skip the subtitle,
+        accessibility and CORS probes and only analyze media segments.
+        """
+        ctx = self.create_context(url, out, segments, quick)
+        result = AnalysisResult(url)
+        start = time.time()
+        try:
+            self.run(ctx)
+        except Exception as e:
+            logging.error("Error analyzing %s: %s", url, e, exc_info=True)
+            result.error = str(e) or e.__class__.__name__
+        result.elapsed = time.time() - start
+        result.is_variant = ctx.is_variant
+        result.variants = ctx.videoFramesInfoDict
+        result.network = ctx.timings
+        result.warnings = ctx.warnings
+        result.captions = ctx.captions_detected
+        result.subtitle_issues = ctx.subtitle_issues
+        if out is None:
+            result.report = ctx.out.getvalue()
+        return result
+
+    def run(self, ctx):
+        m3u8_obj = load_master_playlist(ctx, ctx.url)
+
+        # Add debug output here
+        print_manifest_info(ctx, m3u8_obj, ctx.base_url)
+
+        # Diagnose subtitles in the master playlist
+        subtitles, issues = diagnose_subtitles(m3u8_obj, ctx.base_url)
+        ctx.subtitle_issues = issues
+
+        # Log subtitle details
+        ctx.print("\n** Subtitle/Caption Analysis **")
+        if subtitles:
+            for group_id, data in subtitles.items():
+                ctx.print(f"Subtitle Group: {group_id}")
+                ctx.print(f"  URI: {data['uri']}")
+                ctx.print(f"  Language: {data.get('language', 'unknown')}")
+        else:
+            ctx.print("No subtitle groups found in the master playlist.")
+
+        # Log any issues
+        if issues:
+            ctx.print("\nPotential Issues Found:")
+            for issue in issues:
+                ctx.print(f"- {issue}")
+                logging.warning(issue)
+        else:
+            ctx.print("✓ All subtitle configurations appear valid.")
+            logging.info("All subtitle configurations appear valid.")
+
+        # Analyze subtitles separately from variants
+        if not ctx.quick:
+            ctx.print("\n** Analyzing Subtitle Tracks **")
+            analyze_subtitles(ctx, m3u8_obj, ctx.base_url)
+
+        # Variant playlist analysis
+        ctx.is_variant = m3u8_obj.is_variant
+        if m3u8_obj.is_variant:
+            logging.info("Master playlist detected. Starting analysis of variants.")
+            ctx.print("Master playlist. List of variants:")
+
+            for playlist in m3u8_obj.playlists:
+                # Get the resolved URL for the variant
+                variant_url = urljoin(ctx.base_url, playlist.uri) if not playlist.uri.startswith('http') else playlist.uri
+
+                # Verify URL is accessible
+                if not ctx.quick and not ctx.fetcher.verify_url(variant_url):
+                    logging.warning("Skipping inaccessible playlist URL: %s", variant_url)
+                    continue
+
+                try:
+                    analyze_variant(ctx, variant_url, playlist.stream_info.bandwidth)
+                except Exception as e:
+                    logging.error("Error processing variant %s: %s", variant_url, e)
+                    continue
+        else:
+            logging.info("Single variant playlist detected. Starting analysis.")
+            try:
+                analyze_variant(ctx, ctx.url, 0)  # Use 0 as bandwidth for single variant
+            except Exception as e:
+                logging.error("Error analyzing single variant playlist: %s", e)
+
+        # Perform frame alignment analysis
+        analyze_variants_frame_alignment(ctx)
+
+        # Generate summary report
+        generate_summary(ctx, m3u8_obj, ctx.base_url)
+
+        logging.info("Analysis completed successfully.")
+        ctx.print("\nAnalysis completed successfully.")
+        ctx.print("Warnings were issued for missing or misaligned segments, but the script continued analyzing the rest of the stream.")
+        ctx.print(f"Total variants analyzed: {len(ctx.videoFramesInfoDict)}")
+
+
+def load_playlist(ctx, url):
+    if not is_url(url):
+        return m3u8.load(url)
+
+    playlist = ctx.fetcher.get_parsed(url, parse_playlist, timings=ctx.timings)
+    if playlist is None:
+        raise IOError("Failed to download playlist {}".format(url))
+    return playlist
+
+
+def parse_playlist(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return m3u8.loads(data)
+
+
+def load_master_playlist(ctx, url, ttl=60):
+    """
+    Load the playlist the analysis starts from, reusing a parsed copy from
+    the shared playlist cache while it is younger than `ttl` seconds. Only
+    master playlists are cached; media playlists of live streams change with
+    every target duration.
+    """
+    cache = ctx.playlist_cache
+    if cache is None:
+        return load_playlist(ctx, url)
+
+    entry = cache.get(url)
+    now = time.time()
+    if entry is not None and entry[0] > now:
+        logging.debug("Playlist cache hit: %s", url)
+        return entry[1]
+
+    playlist = load_playlist(ctx, url)
+    if playlist.is_variant:
+        cache.put(url, (now + ttl, playlist))
+    return playlist
+
+
+def log_manifest_content(ctx, url):
+    try:
+        manifest = load_playlist(ctx, url)
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info("Manifest content for %s:\n%s", url, manifest.dumps())
+        ctx.print(f"Manifest content logged for {url}")
+    except Exception as e:
+        logging.error("Failed to load manifest %s: %s", url, e)
+        ctx.print(f"Failed to load manifest {url}: {e}")
+
+
+def analyze_variant(ctx, variant_url, bandwidth):
+    if not ctx.quick:
+        origin = get_origin(variant_url)
+        if not check_cors(ctx, variant_url, origin=origin):
+            logging.warning("CORS compliance failed for URL: %s from Origin: %s", variant_url, origin)
+            return
+        logging.info("CORS compliance passed for URL: %s from Origin: %s", variant_url, origin)
+    try:
+        logging.info("Starting analysis for variant %s bandwidth: %s", variant_url, bandwidth)
+
+        variant_playlist = ctx.fetcher.get_parsed(variant_url, parse_playlist, timings=ctx.timings,
+                                                  variant=bandwidth)
+        if variant_playlist is None:
+            logging.error("Failed to download variant data from %s", variant_url)
+            return
+
+        if hasattr(variant_playlist, 'program_date_time') and variant_playlist.program_date_time:
+            logging.info("Variant playlist has program_date_time: %s", variant_playlist.program_date_time.isoformat())
+        else:
+            logging.info("Variant playlist has no program_date_time attribute set.")
+
+        segments = variant_playlist.segments
+        indexes = ctx.sampler.select_shared(segments, ctx.num_segments_to_analyze_per_playlist, ctx.sampled_segments)
+        if ctx.sampled_segments is None:
+            ctx.sampled_segments = indexes
+        num_segments = len(indexes)
+        logging.debug("Segments selected (%s sampling): %s", ctx.sampler.mode, indexes)
+        # One timeline per variant, so a PTS wrap between segments is unwrapped
+        unwrapper = TimestampUnwrapper()
+
+        for i in indexes:
+            segment = segments[i]
+            logging.debug("Processing segment %d/%d URI: %s", i + 1, len(segments), segment.uri)
+            segment_uri = urljoin(variant_url, segment.uri) if not segment.uri.startswith('http') else segment.uri
+
+            httpRange = get_range(segment.byterange)
+            stored = ctx.store.lookup(segment_uri, httpRange) if ctx.store is not None else None
+            if stored is not None and stored.etag is not None and stored.etag == ctx.fetcher.get_etag(segment_uri):
+                replay_segment(ctx, stored, bandwidth, i)
+                continue
+
+            segment_data, etag = download_segment(ctx, segment_uri, httpRange, bandwidth, i)
+            if segment_data is None:
+                logging.error("Failed segment download (Variant: %s, Segment %d, URI: %s)", bandwidth, i + 1, segment_uri)
+                continue
+            else:
+                logging.debug("Segment downloaded successfully (Variant: %s, Segment %d)", bandwidth, i + 1)
+
+            digest = None
+            if ctx.store is not None:
+                from store import content_hash
+                digest = content_hash(segment_data)
+                if stored is not None and stored.content_hash == digest:
+                    replay_segment(ctx, stored, bandwidth, i)
+                    continue
+            first_warning = len(ctx.warnings)
+
+            ts_parser = TSSegmentParser(bytearray(segment_data), ctx.parameter_sets, unwrapper)
+            ts_parser.prepare()
+            check_parameter_set_changes(ctx, ts_parser, variant_url, bandwidth, i)
+
+            # THIS IS CRITICAL
+            try:
+                printFormatInfo(ctx, ts_parser)
+                printTimingInfo(ctx, ts_parser, segment)
+                printPacketIntegrity(ctx, ts_parser, bandwidth, i)
+                analyzeFrames(ctx, ts_parser, bandwidth, i)
+                printTimedMetadata(ctx, ts_parser)
+                printPCRTiming(ctx, ts_parser, bandwidth, i)
+            except Exception as e:
+                logging.error("Exception during segment analysis: %s", e, exc_info=True)
+
+            if ctx.store is not None:
+                previous = None
+                if i > 0:
+                    previous = (urljoin(variant_url, segments[i - 1].uri), get_range(segments[i - 1].byterange))
+                store_segment(ctx, bandwidth, i, segment_uri, httpRange, etag, digest, ctx.warnings[first_warning:],
+                              previous)
+
+    except Exception as e:
+        logging.error("Critical error processing variant %s: %s", variant_url, e, exc_info=True)
+
+
+def check_parameter_set_changes(ctx, ts_parser, variant_url, bandwidth, segment_index):
+    """Warn when the active SPS of a video track differs from the last one seen for this variant."""
+    for i in range(ts_parser.getNumTracks()):
+        track = ts_parser.getTrack(i)
+        for sps in getattr(track.payloadReader, 'sequenceParameterSets', ()):
+            if ctx.parameter_sets.activate((variant_url, track.pid), sps) is not None:
+                ctx.log_warning(f"SPS changed mid-stream (Variant: {bandwidth} bps, segment {segment_index}, track #{i}): "
+                                f"{track.payloadReader.getFormat()}")
+
+
+def download_segment(ctx, uri, httpRange=None, variant=None, segment=None):
+    """Returns (data, ETag); the ETag is None when unknown, e.g. on a segment cache hit."""
+    cache = ctx.segment_cache
+    key = (uri, httpRange)
+    if cache is not None:
+        data = cache.get(key)
+        if data is not None:
+            logging.debug("Segment cache hit: %s", uri)
+            return data, None
+
+    response = ctx.fetcher.download(uri, httpRange, timings=ctx.timings, variant=variant, segment=segment)
+    if response is None:
+        return None, None
+    if cache is not None:
+        cache.put(key, response.content)
+    return response.content, response.headers.get('ETag')
+
+
+def replay_segment(ctx, stored, bandwidth, segment_index):
+    """Add the stored results of an unchanged segment to the run instead of analyzing it again."""
+    analyzed = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stored.analyzed))
+    ctx.print(f"\n\t** Segment {segment_index} unchanged since {analyzed}; stored results reused **")
+    if stored.summary is not None:
+        vf = ctx.videoFramesInfoDict.setdefault(bandwidth, VideoFrameInfo())
+        vf.merge(VideoFrameInfo.from_state(stored.summary, segment_index))
+    for warning in stored.warnings:
+        ctx.log_warning(warning)
+
+
+def store_segment(ctx, bandwidth, segment_index, uri, httpRange, etag, digest, warnings, previous=None):
+    vf = ctx.videoFramesInfoDict.get(bandwidth)
+    summary = None
+    if vf is not None and segment_index in vf.segmentsKeyframeStats:
+        summary = vf.segment(segment_index)
+    try:
+        ctx.store.save(ctx.url, bandwidth, segment_index, uri, httpRange, etag, digest, summary, warnings,
+                       previous=previous)
+    except Exception as e:
+        logging.error("Failed to store the results of %s: %s", uri, e)
+
+
+def get_playlist_duration(variant):
+    duration = 0
+    for i in range(0, len(variant.segments)):
+        duration = duration + variant.segments[i].duration
+    return duration
+
+
+def get_range(segment_range):
+    if(segment_range is None):
+        return None
+
+    params= segment_range.split('@')
+    if(params is None or len(params) != 2):
+        return None
+
+    start = int(params[1])
+    length = int(params[0])
+
+    return "bytes={}-{}".format(start, start+length-1);
+
+
+def printFormatInfo(ctx, ts_parser):
+    ctx.print ("\t** Tracks and Media formats **")
+
+    for i in range(0, ts_parser.getNumTracks()):
+        track = ts_parser.getTrack(i)
+        ctx.print(("\tTrack #{} - Type: {}, Format: {}".format(i,
+            track.payloadReader.getMimeType(), track.payloadReader.getFormat())))
+
+
+def printTimingInfo(ctx, ts_parser, segment):
+    ctx.print ("\n\t** Timing information **")
+    ctx.print(("\tSegment declared duration: {}".format(segment.duration)))
+    minDuration = 0;
+    for i in range(0, ts_parser.getNumTracks()):
+        track = ts_parser.getTrack(i)
+        if track.payloadReader.getFirstPTS() is None:
+            ctx.print(("\tTrack #{} - No PTS found".format(i)))
+            continue
+        ctx.print(("\tTrack #{} - Duration: {} s, First PTS: {} s, Last PTS: {} s".format(i,
+            ticksToSeconds(track.payloadReader.getDuration()), ticksToSeconds(track.payloadReader.getFirstPTS()),
+            ticksToSeconds(track.payloadReader.getLastPTS()))))
+        if(track.payloadReader.getDuration() != 0 and (minDuration == 0 or minDuration > track.payloadReader.getDuration())):
+            minDuration = track.payloadReader.getDuration()
+
+    minDuration = ticksToSeconds(minDuration)
+    if minDuration > 0:
+        ctx.print(("\tDuration difference (declared vs real): {0}s ({1:.2f}%)".format(segment.duration - minDuration, abs((1 - segment.duration/minDuration)*100))))
+    else:
+        ctx.print("\tDuration is 0")
+
+
+def printPacketIntegrity(ctx, ts_parser, bw, segment_index):
+    integrity = ts_parser.getPacketIntegrity()
+    if integrity is None:
+        return
+
+    ctx.print("\n\t** Packet integrity **")
+    summary = "Packets: {}, CC errors: {}, Duplicates: {}, TEI: {}, Sync errors: {}".format(
+        integrity.packets, integrity.getCCErrorCount(), integrity.getDuplicateCount(),
+        integrity.teiPackets, integrity.syncErrors)
+    ctx.print(f"\t{summary}")
+    if integrity.discontinuities:
+        ctx.print(f"\tDiscontinuity indicators by PID: {integrity.discontinuities}")
+
+    if integrity.hasErrors():
+        ctx.log_warning(f"Packet errors in variant {bw} bps, segment {segment_index}: {summary}")
+        for index, pid, description in integrity.errors:
+            logging.debug("Packet %d, PID 0x%x: %s", index, pid, description)
+
+
+def printPCRTiming(ctx, ts_parser, bw, segment_index):
+    timing = ts_parser.getPCRTiming()
+    if timing is None:
+        return
+
+    ctx.print("\n\t** PCR and mux rate **")
+    if timing.getPCRCount() < 2:
+        ctx.print(f"\tPCRs found: {timing.getPCRCount()}, not enough to measure the mux rate")
+        return
+
+    muxRate = timing.getMuxRate()
+    maxInterval = timing.getMaxInterval() / float(PCR_CLOCK)
+    ctx.print(f"\tPCR PID: 0x{timing.pcrPid:x}, PCRs: {timing.getPCRCount()}, Random access points: {len(timing.randomAccess)}")
+    ctx.print(f"\tMux rate: {muxRate / 1000.0:.1f} kbps, PCR jitter: {timing.getJitter() * 1000000.0 / PCR_CLOCK:.1f} us, "
+              f"Max PCR interval: {maxInterval * 1000:.1f} ms")
+
+    for i in range(ts_parser.getNumTracks()):
+        track = ts_parser.getTrack(i)
+        firstPTS = track.payloadReader.getFirstPTS()
+        if firstPTS is None or firstPTS < 0:
+            continue
+        offset = timing.getPTSOffset(firstPTS)
+        ctx.print(f"\tTrack #{i} - First PTS - first PCR: {ticksToSeconds(offset):.3f} s")
+
+    if maxInterval * PCR_CLOCK > MAX_PCR_INTERVAL:
+        ctx.log_warning(f"PCR interval of {maxInterval * 1000:.1f} ms exceeds 100 ms (Variant: {bw} bps, segment {segment_index})")
+
+    vf = ctx.videoFramesInfoDict.get(bw)
+    if vf is not None:
+        vf.segmentsMuxRate[segment_index] = muxRate
+
+
+def analyzeFrames(ctx, ts_parser, bw, segment_index):
+    ctx.print("\n\t** Frames **")
+    videoFramesInfoDict = ctx.videoFramesInfoDict
+
+    for i in range(ts_parser.getNumTracks()):
+        track = ts_parser.getTrack(i)
+        ctx.print(f"\tTrack #{i} - Frames: ", end=' ')
+
+        frameCount = min(ctx.max_frames_to_show, len(track.payloadReader.frames))
+        for j in range(frameCount):
+            ctx.print(f"{track.payloadReader.frames.types[j]}", end=' ')
+
+        if track.payloadReader.getMimeType().startswith("video/"):
+            ctx.print(f"\tAA: {segment_index}, BB: {bw}")
+
+            # Ensure bandwidth key initialization to prevent KeyError
+            if bw not in videoFramesInfoDict:
+                videoFramesInfoDict[bw] = VideoFrameInfo()
+                logging.debug("Initialized videoFramesInfoDict[%s] with new VideoFrameInfo instance.", bw)
+
+            if segment_index in videoFramesInfoDict[bw].segmentsKeyframeStats:
+                logging.debug("More than one video track for bw %s, segment %s; only the first is analyzed.", bw, segment_index)
+            else:
+                if not track.payloadReader.frames:
+                    logging.warning("No video frames found for bw %s, segment %s. Setting PTS to 0.", bw, segment_index)
+
+                analyzeVideoframes(ctx, track, bw, segment_index)
+
+        ctx.print("")
+
+
+def printTimedMetadata(ctx, ts_parser):
+    for i in range(ts_parser.getNumTracks()):
+        tags = getattr(ts_parser.getTrack(i).payloadReader, 'tags', None)
+        if not tags:
+            continue
+        ctx.print(f"\t** Timed metadata (Track #{i}) **")
+        for tag in tags:
+            ctx.print(f"\tID3 tag at {ticksToSeconds(tag.pts)} s: {', '.join(tag.getFrameIds())}")
+
+
+def analyzeVideoframes(ctx, track, bw, segment_index):
+    vf = ctx.videoFramesInfoDict[bw]
+    frames = track.payloadReader.frames
+    stats = vf.add_segment(segment_index, frames, track.payloadReader.getDuration())
+
+    ctx.print ("")
+    if len(frames) > 0:
+        if frames.keyframes[0]:
+            ctx.print("\t\tGood! Track starts with a keyframe")
+        else:
+            ctx.print("\t\tWarning: note this is not starting with a keyframe. This will cause not seamless bitrate switching")
+
+    nkf = stats.count
+    ctx.print(("\t\tKeyframes count: {}".format(nkf)))
+    if nkf == 0:
+        ctx.print ("\t\tWarning: there are no keyframes in this track! This will cause a bad playback experience")
+    if nkf > 1:
+        ctx.print(("\t\tKey frame interval within track: {} seconds (min {}, max {}, stddev {:.3f})".format(
+            ticksToSeconds(stats.mean_interval), ticksToSeconds(stats.min_interval),
+            ticksToSeconds(stats.max_interval), ticksToSeconds(stats.stddev_interval))))
+        ctx.print(("\t\tGOP lengths (frames: count): {}".format(
+            ", ".join("{}: {}".format(k, v) for k, v in sorted(stats.gop_histogram.items())))))
+    else:
+        if track.payloadReader.getDuration() > 3 * TIMESCALE:
+            ctx.print ("\t\tWarning: track too long to have just 1 keyframe. This could cause bad playback experience and poor seeking accuracy in some video players")
+
+    variant = vf.keyframeStats
+    if variant.count > 1 and variant.intervals:
+        kfiDeviation = variant.max_interval - variant.min_interval
+        if kfiDeviation > TIMESCALE // 2:
+            ctx.print(("\t\tWarning: Key frame interval is not constant. Min KFI: {} s, Max KFI: {} s".format(
+                ticksToSeconds(variant.min_interval), ticksToSeconds(variant.max_interval))))
+
+
+def analyze_variants_frame_alignment(ctx):
+    if not ctx.videoFramesInfoDict:
+        logging.warning("No video frame information found. Skipping alignment analysis.")
+        ctx.print("No variants to analyze for frame alignment.")
+        return
+
+    timelines = [VariantTimeline(bw, vf.segmentsFirstFramePts, vf.keyframeStats.positions, vf.segmentsStartWithKeyframe)
+                 for bw, vf in sorted(ctx.videoFramesInfoDict.items())]
+    logging.info("Starting alignment check for %d variants", len(timelines))
+    report = check_alignment(timelines, ctx.alignment_tolerance)
+    ctx.print(f"\nChecking alignment of {len(timelines)} variants over {report.segments_checked} segments "
+              f"(tolerance {report.tolerance} ticks)")
+
+    for segment_index, bw in report.missing:
+        ctx.log_warning(f"Segment index {segment_index} missing in variant {bw} bps. Skipping.")
+    for segment_index, reference, bw, reference_pts, pts in report.misaligned:
+        ctx.log_warning(f"Variants {reference} bps and {bw} bps, segment {segment_index}, "
+                        f"are not aligned (first frame PTS not equal {ticksToSeconds(reference_pts)} != {ticksToSeconds(pts)}, "
+                        f"off by {pts - reference_pts} ticks)")
+    for bw, segments in report.segments_without_keyframe.items():
+        ctx.log_warning(f"Variant {bw} bps: segments {', '.join(map(str, segments))} do not start with a keyframe")
+    for bw, unmatched in report.keyframe_mismatches.items():
+        ctx.log_warning(f"Variants {report.keyframe_reference} bps and {bw} bps have {unmatched} keyframes "
+                        f"with no counterpart within {report.tolerance} ticks")
+
+    ctx.print("\nCompleted alignment check for all variants.")
+    logging.info("Completed alignment check for all variants.")
+
+
+def check_for_captions(ctx, playlist, base_url):
+    """
+    Check for and validate caption/subtitle tracks
+    """
+    if hasattr(playlist, 'media'):
+        # First log all media entries for debugging
+        logging.debug("Found media entries in playlist:")
+        for media in playlist.media:
+            logging.debug("Media entry - Type: %s, Language: %s, URI: %s", media.type, media.language, getattr(media, 'uri', None))
+
+        # Then process subtitles
+        for media in playlist.media:
+            if media.type == 'SUBTITLES':
+                logging.info("Found subtitle track - Language: %s", media.language)
+
+                if hasattr(media, 'uri') and media.uri:
+                    absolute_uri = urljoin(base_url, media.uri) if not media.uri.startswith('http') else media.uri
+                    media.uri = absolute_uri  # Update with resolved URL
+                    logging.debug("Resolved subtitle URI: %s", absolute_uri)
+
+                    try:
+                        response = ctx.fetcher.get(absolute_uri, base_url=base_url)
+                        if response.status_code == 200:
+                            logging.info("Successfully accessed subtitle playlist: %s", absolute_uri)
+                        else:
+                            logging.warning("Subtitle playlist %s returned status %s", absolute_uri, response.status_code)
+                    except Exception as e:
+                        logging.error("Error accessing subtitle playlist: %s", e)
+
+                # Always add to captions_detected, even if URI validation fails
+                ctx.captions_detected.append({
+                    'language': media.language or 'unknown',
+                    'type': media.type,
+                    'uri': getattr(media, 'uri', 'no_uri'),
+                    'group_id': getattr(media, 'group_id', 'unknown'),
+                    'name': getattr(media, 'name', 'unknown'),
+                    'default': getattr(media, 'default', False),
+                    'autoselect': getattr(media, 'autoselect', False)
+                })
+    else:
+        logging.debug("No media entries found in playlist")
+
+
+def print_manifest_info(ctx, playlist, base_url):
+    """
+    Print detailed information about the manifest content
+    """
+    ctx.print("\n** Manifest Debug Info **")
+
+    # Print media entries
+    if hasattr(playlist, 'media'):
+        ctx.print("\nMedia entries found:", len(playlist.media))
+        for media in playlist.media:
+            ctx.print("\nMedia entry:")
+            ctx.print(f"  Type: {getattr(media, 'type', 'None')}")
+            ctx.print(f"  Group ID: {getattr(media, 'group_id', 'None')}")
+            ctx.print(f"  Language: {getattr(media, 'language', 'None')}")
+            ctx.print(f"  Name: {getattr(media, 'name', 'None')}")
+            ctx.print(f"  URI: {getattr(media, 'uri', 'None')}")
+            ctx.print(f"  Default: {getattr(media, 'default', 'None')}")
+            ctx.print(f"  Autoselect: {getattr(media, 'autoselect', 'None')}")
+    else:
+        ctx.print("No media entries found")
+
+    # Print playlists
+    if hasattr(playlist, 'playlists'):
+        ctx.print("\nPlaylists found:", len(playlist.playlists))
+        for p in playlist.playlists:
+            ctx.print("\nPlaylist:")
+            ctx.print(f"  Bandwidth: {p.stream_info.bandwidth}")
+            ctx.print(f"  Resolution: {getattr(p.stream_info, 'resolution', 'None')}")
+            ctx.print(f"  Codecs: {getattr(p.stream_info, 'codecs', 'None')}")
+            ctx.print(f"  Subtitles: {getattr(p.stream_info, 'subtitles', 'None')}")
+            ctx.print(f"  URI: {getattr(p, 'uri', 'None')}")
+    else:
+        ctx.print("No playlists found")
+
+
+def diagnose_subtitles(master_playlist, base_url):
+    """
+    Diagnose subtitle configurations in the master playlist only.
+    """
+    subtitles = {}
+    issues = []
+
+    logging.info("Starting subtitle diagnostics.")
+
+    # Collect subtitle groups from EXT-X-MEDIA tags
+    if hasattr(master_playlist, 'media'):
+        for media in master_playlist.media:
+            if media.type == 'SUBTITLES':
+                group_id = media.group_id
+                uri = urljoin(base_url, media.uri) if not media.uri.startswith("http") else media.uri
+                subtitles[group_id] = {
+                    'uri': uri,
+                    'language': media.language,
+                }
+
+    # Check if subtitles are defined (ensure there's at least one group)
+    if not subtitles:
+        issues.append("No subtitle groups are defined in the master playlist.")
+
+    return subtitles, issues
+
+
+def check_subtitle_playlist(ctx, subtitle_uri, base_url):
+    """
+    Check a subtitle playlist and its segments.
+    """
+    if not subtitle_uri.startswith('http'):
+        subtitle_uri = urljoin(base_url, subtitle_uri)
+
+    ctx.print(f"\nChecking subtitle playlist: {subtitle_uri}")
+
+    try:
+        response = ctx.fetcher.get(subtitle_uri, base_url=base_url)
+        if response.status_code == 200:
+            sub_playlist = m3u8.loads(response.text)
+
+            ctx.print("\nSubtitle format details:")
+            ctx.print(f"  Total segments: {len(sub_playlist.segments)}")
+
+            # Check first segment to determine format
+            if sub_playlist.segments:
+                first_segment = sub_playlist.segments[0]
+                segment_uri = urljoin(subtitle_uri, first_segment.uri)
+                ctx.print(f"  First segment URI: {first_segment.uri}")
+                ctx.print(f"  Segment duration: {first_segment.duration}")
+
+                # Try to fetch first segment to check format
+                seg_response = ctx.fetcher.get(segment_uri, base_url=base_url)
+                if seg_response.status_code == 200:
+                    content = seg_response.text[:200]  # Just look at start of file
+                    ctx.print("\nSegment content preview:")
+                    ctx.print(content)
+
+                    # Determine format
+                    if content.strip().startswith('WEBVTT'):
+                        ctx.print("\nFormat: WebVTT")
+                    elif content.strip().startswith('1\n') or content.strip().startswith('1\r\n'):
+                        ctx.print("\nFormat: SRT")
+                    else:
+                        ctx.print("\nUnknown subtitle format")
+                else:
+                    ctx.print(f"\nCouldn't access subtitle segment: {seg_response.status_code}")
+        else:
+            ctx.print(f"Couldn't access subtitle playlist: {response.status_code}")
+
+    except Exception as e:
+        ctx.print(f"Error checking subtitle playlist: {str(e)}")
+        logging.error("Error checking subtitle playlist: %s", e)
+
+
+def analyze_subtitles(ctx, m3u8_obj, base_url):
+    """
+    Analyze all subtitle tracks in the master playlist.
+    """
+    if hasattr(m3u8_obj, 'media'):
+        for media in m3u8_obj.media:
+            if media.type == 'SUBTITLES':
+                subtitle_uri = urljoin(base_url, media.uri) if not media.uri.startswith("http") else media.uri
+                check_subtitle_playlist(ctx, subtitle_uri, base_url)
+
+
+def print_network_timing(ctx):
+    """Per-host request timing histograms: connection set-up, TTFB, total time and throughput."""
+    hosts = ctx.timings.hosts
+    if not hosts:
+        return
+
+    ctx.print("\n** Network timing **")
+    for host, summary in sorted(hosts.items()):
+        ctx.print(f"Host {host}: {summary.requests} requests, {summary.errors} failed, {summary.bytes} bytes")
+        for name, histogram, unit in (("Connect", summary.connect, "ms"), ("TTFB", summary.ttfb, "ms"),
+                                      ("Total", summary.total, "ms"), ("Throughput", summary.throughput, "Mbit/s")):
+            if not histogram.count:
+                continue
+            buckets = ", ".join(f"{label}: {count}" for label, count in histogram.to_dict()['buckets'].items())
+            ctx.print(f"  {name}: mean {histogram.mean:.1f} {unit}, p50 {histogram.percentile(50):.1f}, "
+                      f"p90 {histogram.percentile(90):.1f}, max {histogram.max:.1f} ({buckets})")
+
+
+def print_subtitle_summary(ctx, master_playlist, base_url):
+    """
+    Print a summary of subtitle tracks found in the master playlist.
+    """
+    ctx.print("\n** Subtitle/Caption Summary **")
+    if not hasattr(master_playlist, 'media'):
+        ctx.print("No subtitle tracks found in the master playlist.")
+        logging.info("No subtitle tracks found in the master playlist.")
+        return
+
+    subtitle_tracks = [m for m in master_playlist.media if m.type == 'SUBTITLES']
+    if not subtitle_tracks:
+        ctx.print("No subtitle tracks found in the master playlist.")
+        logging.info("No subtitle tracks found in the master playlist.")
+        return
+
+    for track in subtitle_tracks:
+        ctx.print(f"\nSubtitle Track Details:")
+        ctx.print(f"  Language: {track.language}")
+        ctx.print(f"  Name: {track.name}")
+        ctx.print(f"  Group ID: {track.group_id}")
+        ctx.print(f"  Type: WebVTT")
+        ctx.print(f"  Playlist: {track.uri}")
+        ctx.print(f"  Default: {getattr(track, 'default', 'NO')}")
+        ctx.print(f"  Autoselect: {getattr(track, 'autoselect', 'NO')}")
+
+        # Resolve subtitle URI
+        resolved_uri = urljoin(base_url, track.uri) if not track.uri.startswith('http') else track.uri
+        logging.debug("Resolved subtitle URI: %s", resolved_uri)
+
+    ctx.print("\n✓ All subtitle configurations in the master playlist appear valid.")
+    logging.info("All subtitle configurations in the master playlist appear valid.")
+
+
+def generate_summary(ctx, master_playlist, base_url):
+    """
+    Generate a comprehensive summary of the analysis.
+    """
+    logging.info("Generating summary report.")
+    ctx.print("\n** Analysis Summary **")
+
+    # Variant analysis summary
+    ctx.print(f"Total variants analyzed: {len(ctx.videoFramesInfoDict)}")
+    for bw, vf in ctx.videoFramesInfoDict.items():
+        ctx.print(f"Variant {bw} bps:")
+        ctx.print(f"  Segments analyzed: {len(vf.segmentsFirstFramePts)}")
+        stats = vf.keyframeStats
+        ctx.print(f"  Total keyframes: {stats.count}")
+        if stats.intervals:
+            ctx.print(f"  Min keyframe interval: {ticksToSeconds(stats.min_interval):.2f} seconds")
+            ctx.print(f"  Max keyframe interval: {ticksToSeconds(stats.max_interval):.2f} seconds")
+            ctx.print(f"  Mean keyframe interval: {ticksToSeconds(stats.mean_interval):.2f} seconds "
+                      f"(stddev {ticksToSeconds(stats.stddev_interval):.3f})")
+        else:
+            ctx.print("  Keyframe interval: n/a (fewer than 2 keyframes in consecutive segments)")
+
+    print_network_timing(ctx)
+
+    # Print subtitle summary using the updated function
+    print_subtitle_summary(ctx, master_playlist, base_url)
+
+    # Warnings summary
+    if ctx.warnings:
+        ctx.print("\n** Summary of Warnings **")
+        for warning in ctx.warnings:
+            ctx.print(f"- {warning}")
+    else:
+        ctx.print("\nNo warnings encountered during the analysis.")
+
+    logging.info("Summary report generated.")
+
+
+def validate_uri_paths(ctx, manifest_url, m3u8_obj):
+    base_path = manifest_url.rsplit('/', 1)[0] + '/'
+    issues = []
+
+    logging.info("Base path for resolution: %s", base_path)
+
+    if hasattr(m3u8_obj, 'playlists'):
+        for playlist in m3u8_obj.playlists:
+            try:
+                absolute_uri = urljoin(base_path, playlist.uri)
+                logging.info("Resolved absolute URL: %s", absolute_uri)
+
+                # Use headers to validate the URL
+                response = ctx.fetcher.get(absolute_uri, base_url=manifest_url)
+                if response.status_code != 200:
+                    logging.warning("Inaccessible playlist URL: %s", absolute_uri)
+                    issues.append({
+                        'type': 'inaccessible',
+                        'uri': playlist.uri,
+                        'url': absolute_uri,
+                        'status_code': response.status_code,
+                    })
+            except Exception as e:
+                logging.error("Error processing playlist: %s", e)
+                issues.append({'type': 'error', 'uri': playlist.uri, 'error': str(e)})
+
+    return issues
+
+
+def check_cors(ctx, url, origin="https://your-domain.com"):
+    headers = {
+        "Origin": origin,
+        "Access-Control-Request-Method": "GET",
+    }
+
+    try:
+        response = ctx.fetcher.options(url, headers=headers, verify=True)
+        ctx.print(f"CORS check OPTIONS response status: {response.status_code}")
+        ctx.print("Headers returned:")
+        for header, value in response.headers.items():
+            ctx.print(f"  {header}: {value}")
+
+        if response.status_code == 403:
+            ctx.print("🚨 CORS pre-flight check failed with 403.")
+            return False
+
+        required_headers = ["Access-Control-Allow-Origin", "Access-Control-Allow-Methods"]
+        for header in required_headers:
+            if header not in response.headers:
+                ctx.print(f"⚠️  Missing required CORS header: {header}")
+                return False
+
+        allowed_origin = response.headers.get("Access-Control-Allow-Origin", "")
+        allowed_methods = response.headers.get("Access-Control-Allow-Methods", "")
+
+        ctx.print(f"Allowed Origin: {allowed_origin}")
+        ctx.print(f"Allowed Methods: {allowed_methods}")
+
+        if origin != allowed_origin and allowed_origin != "*":
+            ctx.print("⚠️  Origin mismatch detected.")
+            return False
+
+        if "GET" not in allowed_methods:
+            ctx.print("⚠️  GET method not allowed in CORS settings.")
+            return False
+
+        ctx.print("✅ CORS pre-flight check passed.")
+        return True
+
+    except Exception as e:
+        ctx.print(f"Error during CORS check: {e}")
+        return False
+
+
+def print_path_issues(ctx, issues):
+    if issues:
+        ctx.print("\nPath Resolution Issues:")
+        logging.info("\nPath Resolution Issues:")
+        for issue in issues:
+            if issue['type'] == 'inaccessible':
+                msg = (f"URI: {issue['uri']}\n"
+                       f"Absolute URL: {issue['url']}\n"
+                       f"Status Code: {issue['status_code']}\n")
+            elif issue['type'] == 'error':
+                msg = (f"URI: {issue['uri']}\n"
+                       f"Error: {issue['error']}\n")
+            else:
+                msg = f"Unknown issue type: {issue}"
+            ctx.print(msg)
+            logging.info(msg)
+
+
+def get_origin(url):
+    parsed_url = urlparse(url)
+    origin = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    return origin
@@ -0,0 +1,115 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+
+from analyzer import AnalysisResult
+
+
+def read_urls(source):
+    """
+    Yield stream URLs from a file path, or from stdin when `source` is "-".
+    Blank lines and lines starting with '#' are ignored.
+    """
+    if source == '-':
+        lines = sys.stdin
+    else:
+        lines = open(source)
+    try:
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+
+class JsonLinesWriter(object):
+    """Writes one JSON record per line, flushing after each one."""
+
+    def __init__(self, out):
+        self.out = out
+        self._lock = threading.Lock()
+
+    def __call__(self, result):
+        line = json.dumps(result.to_dict(), sort_keys=True)
+        with self._lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+
+class BatchRunner(object):
+    """
+    Runs many analyses through one shared HLSAnalyzer.
+
+    At most `jobs` streams are analyzed at once, and at most `per_host` of
+    them against the same origin. URLs waiting for a busy host do not hold a
+    worker, so a slow origin only delays its own streams.
+    """
+
+    def __init__(self, analyzer, jobs=8, per_host=2):
+        self.analyzer = analyzer
+        self.jobs = max(1, jobs)
+        self.per_host = max(1, per_host)
+
+    def run(self, urls, on_result):
+        """
+        Analyze every URL in `urls` and call `on_result(result)` as each one
+        finishes. Returns (analyzed, failed) counts.
+        """
+        pending = OrderedDict()   # host -> deque of urls
+        in_flight = {}            # host -> running analyses
+        futures = {}              # future -> (url, host)
+        analyzed = failed = 0
+
+        for url in urls:
+            pending.setdefault(get_host(url), deque()).append(url)
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or futures:
+                for host in list(pending):
+                    queue = pending[host]
+                    while queue and len(futures) < self.jobs and in_flight.get(host, 0) < self.per_host:
+                        url = queue.popleft()
+                        in_flight[host] = in_flight.get(host, 0) + 1
+                        futures[pool.submit(self._analyze, url)] = (url, host)
+                    if not queue:
+                        del pending[host]
+                    if len(futures) >= self.jobs:
+                        break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, host = futures.pop(future)
+                    in_flight[host] -= 1
+                    result = future.result()
+                    analyzed += 1
+                    if not result.ok:
+                        failed += 1
+                    try:
+                        on_result(result)
+                    except Exception as e:
+                        logging.error("Failed to write result for %s: %s", url, e)
+
+        return analyzed, failed
+
+    def _analyze(self, url):
+        try:
+            return self.analyzer.analyze(url)
+        except Exception as e:
+            logging.error("Unexpected error analyzing %s: %s", url, e, exc_info=True)
+            result = AnalysisResult(url)
+            result.error = str(e) or e.__class__.__name__
+            return result
@@ -0,0 +1,90 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+"""
+Start-up cost benchmark.
+
+Runs `python -X importtime` for the CLI help and for a bare `import analyzer`,
+prints the slowest imports and fails when a module that is meant to be loaded
+lazily shows up, or when the imports the CLI adds on top of a bare interpreter
+go over budget.
+
+    python benchmarks/importtime.py [--budget-ms 25] [--top 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (description, python arguments, checked against the budget,
+#  modules that must not be imported)
+SCENARIOS = [
+    ("hls-analyzer.py -h", ["hls-analyzer.py", "-h"], True,
+     ["requests", "urllib3", "m3u8", "analyzer", "fetcher", "ts_segment",
+      "parsers", "logging.handlers"]),
+    ("import analyzer", ["-c", "import analyzer"], False,
+     ["requests", "urllib3", "parsers.h264reader", "parsers.adtsreader",
+      "parsers.id3reader", "parsers.mpegreader", "parsers.metadatareader"]),
+]
+
+
+def import_times(args):
+    """Return {module: (self_us, cumulative_us, depth)} for one interpreter run."""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=ROOT,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfUs, cumulativeUs, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times[name.strip()] = (int(selfUs), int(cumulativeUs), depth)
+    return times
+
+
+def top_level_cost(times):
+    return sum(cumulative for _, cumulative, depth in times.values() if depth == 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time cost of the CLI")
+    parser.add_argument("--budget-ms", type=float, default=25.0,
+                        help="Allowed import time on top of a bare interpreter (ms)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to show")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario; the fastest one counts")
+    args = parser.parse_args()
+
+    baseline = min(top_level_cost(import_times(["-c", "pass"])) for _ in range(args.runs))
+    failed = False
+
+    for description, pythonArgs, budgeted, forbidden in SCENARIOS:
+        runs = [import_times(pythonArgs) for _ in range(args.runs)]
+        times = min(runs, key=top_level_cost)
+        extraMs = (top_level_cost(times) - baseline) / 1000.0
+
+        print("{}: {:.1f} ms over a bare interpreter{}".format(
+            description, extraMs, " (budget {:.1f} ms)".format(args.budget_ms) if budgeted else ""))
+        slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (selfUs, cumulativeUs, _) in slowest[:args.top]:
+            print("    {:>8.2f} ms self {:>8.2f} ms cumulative  {}".format(
+                selfUs / 1000.0, cumulativeUs / 1000.0, name))
+
+        eager = sorted(name for name in times
+                       if any(name == module or name.startswith(module + ".") for module in forbidden))
+        if eager:
+            failed = True
+            print("    FAIL: imported eagerly: {}".format(", ".join(eager)))
+        if budgeted and extraMs > args.budget_ms:
+            failed = True
+            print("    FAIL: over budget")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe least-recently-used cache bounded by entry count and,
+    optionally, by the total size of the values (as reported by `sizeof`).
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = value
+            self.size += size
+            while (len(self._data) > self.max_entries or
+                   (self.max_bytes is not None and self.size > self.max_bytes)):
+                self._discard(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        value = self._data.pop(key)
+        if self.max_bytes is not None:
+            self.size -= self.sizeof(value)
@@ -0,0 +1,131 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import threading
+import time
+
+# Responses telling us the origin is overloaded; a 501 or 505 only says a
+# method or version is unsupported
+OVERLOAD_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class HostWindow(object):
+    """Concurrency state of one host."""
+
+    def __init__(self, limit):
+        self.limit = float(limit)
+        self.in_flight = 0
+        # Fastest response seen, the latency of an unloaded origin
+        self.min_latency = None
+        # When the limit was last cut; requests started before then do not cut it again
+        self.last_decrease = 0.0
+        self.overloads = 0
+
+
+class AIMDController(object):
+    """
+    Per-host limit on requests in flight, adapted with additive increase,
+    multiplicative decrease (AIMD).
+
+    A host starts at `initial`, by default `maximum`, so the controller
+    only holds requests back once the host has shown signs of overload. Each
+    successful response whose latency stays within `latency_factor` times
+    the fastest one seen from the host adds 1/limit to the limit, so it
+    grows by about one per window of requests. Latency is the time to the
+    response headers, which does not depend on the size of the body, when
+    the slot is told about them with headers_received(). A timeout, a
+    connection error or one of OVERLOAD_STATUSES multiplies the limit by
+    `decrease`, once per window: responses to requests started before the
+    last cut are not counted again. Slower but successful responses leave
+    the limit alone. Limits stay between `minimum` and `maximum`, which
+    should not exceed the connection pool size.
+
+        with controller.slot(host) as slot:
+            response = session.get(url, hooks={'response': slot.headers_received})
+            slot.status = response.status_code
+    """
+
+    def __init__(self, initial=None, minimum=1, maximum=10, decrease=0.5, latency_factor=3.0):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.hosts = {}
+        self._condition = threading.Condition()
+
+    def slot(self, host):
+        return RequestSlot(self, host)
+
+    def limits(self):
+        """{host: current limit}"""
+        with self._condition:
+            return {host: int(window.limit) for host, window in self.hosts.items()}
+
+    def _acquire(self, host):
+        with self._condition:
+            window = self.hosts.get(host)
+            if window is None:
+                initial = self.maximum if self.initial is None else self.initial
+                window = self.hosts[host] = HostWindow(min(max(initial, self.minimum), self.maximum))
+            while window.in_flight >= int(window.limit):
+                self._condition.wait()
+            window.in_flight += 1
+            return window
+
+    def _release(self, window, started, latency, overloaded):
+        with self._condition:
+            window.in_flight -= 1
+            if overloaded:
+                window.overloads += 1
+                if started >= window.last_decrease:
+                    window.limit = max(self.minimum, window.limit * self.decrease)
+                    window.last_decrease = time.monotonic()
+            elif latency is not None:
+                if window.min_latency is None or latency < window.min_latency:
+                    window.min_latency = latency
+                if latency <= window.min_latency * self.latency_factor:
+                    window.limit = min(self.maximum, window.limit + 1.0 / window.limit)
+            self._condition.notify_all()
+
+
+class RequestSlot(object):
+    """
+    One request in flight against a host, from AIMDController.slot(). Set
+    `status` to the response status before leaving the block; an exception
+    leaving the block counts as an overload when it is a timeout or a
+    connection error. headers_received(), usable as a requests response
+    hook, marks the arrival of the response headers; without it the latency
+    is the time spent in the block.
+    """
+
+    def __init__(self, controller, host):
+        self.controller = controller
+        self.host = host
+        self.status = None
+        self._window = None
+        self._started = None
+        self._headers = None
+
+    def __enter__(self):
+        self._window = self.controller._acquire(self.host)
+        self._started = time.monotonic()
+        return self
+
+    def headers_received(self, response=None, *args, **kwargs):
+        # Called once per response when redirects are followed; the last
+        # one is the response actually served
+        self._headers = time.monotonic()
+        return response
+
+    def __exit__(self, excType, exc, traceback):
+        latency = (self._headers if self._headers is not None else time.monotonic()) - self._started
+        if excType is not None:
+            from requests.exceptions import ConnectionError, Timeout
+            overloaded = issubclass(excType, (ConnectionError, Timeout))
+            latency = None
+        else:
+            overloaded = self.status in OVERLOAD_STATUSES
+        self.controller._release(self._window, self._started, latency, overloaded)
+        return False
@@ -0,0 +1,325 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+from cache import LRUCache
+from concurrency import AIMDController
+from retry import HOST_DOWN_STATUSES, CircuitBreaker, CircuitOpenError, RetryPolicy, parse_retry_after
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'
+
+
+# Connections requests keeps per host when no pool size is given
+DEFAULT_POOL_SIZE = 10
+
+# URLs whose validators and parsed body are kept for conditional requests
+DEFAULT_VALIDATED_ENTRIES = 1024
+
+
+def get_referer(url):
+    return '/'.join(url.split('/')[:3])
+
+
+# Set-up time (seconds) of the last connection opened by each thread
+_connectTimes = threading.local()
+
+
+def _timed_pool(base):
+    """Subclass of a urllib3 connection pool whose connections record their set-up time in _connectTimes."""
+    connectionBase = base.ConnectionCls
+
+    class TimedConnection(connectionBase):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return connectionBase.connect(self)
+            finally:
+                _connectTimes.last = time.perf_counter() - start
+
+    return type('Timed' + base.__name__, (base,), {'ConnectionCls': TimedConnection})
+
+
+def create_session(pool_size=None):
+    # requests and urllib3 account for most of the start-up time, so they
+    # are only imported once the first request is about to be made.
+    import requests
+    import urllib3
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    session = requests.Session()
+    if pool_size:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = requests.adapters.HTTPAdapter()
+    # DNS lookup and TCP/TLS set-up happen in connect(); time them there
+    adapter.poolmanager.pool_classes_by_scheme = {
+        'http': _timed_pool(HTTPConnectionPool),
+        'https': _timed_pool(HTTPSConnectionPool),
+    }
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class Fetcher(object):
+    """
+    HTTP access shared by every analysis run.
+
+    Holds a single requests.Session so connections are pooled across
+    playlists, segments and streams analyzed by the same process. Every
+    request goes through `concurrency` (concurrency.AIMDController), which
+    adapts the number of requests in flight to each host, and `breaker`
+    (retry.CircuitBreaker), which refuses requests to hosts that are down.
+    Downloads are retried according to `retry_policy` (retry.RetryPolicy).
+    `validated` (cache.LRUCache) keeps the validators and parsed body of
+    resources loaded with get_parsed(), to revalidate them with conditional
+    requests.
+    """
+
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, session=None, verify=False, pool_size=None, timeout=DEFAULT_TIMEOUT, concurrency=None,
+                 retry_policy=None, breaker=None, validated=None):
+        self._session = session
+        self._sessionLock = threading.Lock()
+        self.verify = verify
+        self.timeout = timeout
+        self.pool_size = pool_size
+        if concurrency is None:
+            concurrency = AIMDController(maximum=pool_size or DEFAULT_POOL_SIZE)
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.validated = validated if validated is not None else LRUCache(max_entries=DEFAULT_VALIDATED_ENTRIES)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._sessionLock:
+                if self._session is None:
+                    self._session = create_session(self.pool_size)
+        return self._session
+
+    def headers(self, uri, base_url=None, httpRange=None):
+        headers = {
+            'User-Agent': USER_AGENT,
+            'Referer': get_referer(base_url or uri),
+            'Accept': '*/*',
+        }
+        if httpRange:
+            headers['Range'] = httpRange
+        return headers
+
+    def request(self, method, uri, headers=None, base_url=None, **kwargs):
+        if headers is None:
+            headers = self.headers(uri, base_url)
+        kwargs.setdefault('verify', self.verify)
+        kwargs.setdefault('allow_redirects', True)
+        kwargs.setdefault('timeout', self.timeout)
+        from requests.exceptions import ConnectionError, Timeout
+        host = urlparse(uri).netloc.lower()
+        self.breaker.before_request(host)
+        try:
+            with self.concurrency.slot(host) as slot:
+                # Time the headers, not the body, so that large segments and
+                # small playlists give comparable latencies
+                hooks = dict(kwargs.pop('hooks', None) or {})
+                responseHooks = hooks.get('response', [])
+                if callable(responseHooks):
+                    responseHooks = [responseHooks]
+                hooks['response'] = [slot.headers_received] + list(responseHooks)
+                response = self.session.request(method, uri, headers=headers, hooks=hooks, **kwargs)
+                slot.status = response.status_code
+        except Exception as e:
+            self.breaker.record(host, failed=isinstance(e, (ConnectionError, Timeout)))
+            raise
+        self.breaker.record(host, failed=response.status_code in HOST_DOWN_STATUSES)
+        return response
+
+    def get(self, uri, **kwargs):
+        return self.request('GET', uri, **kwargs)
+
+    def head(self, uri, **kwargs):
+        return self.request('HEAD', uri, **kwargs)
+
+    def options(self, uri, **kwargs):
+        return self.request('OPTIONS', uri, **kwargs)
+
+    def timed_get(self, uri, headers=None, timings=None, variant=None, segment=None):
+        """
+        GET `uri` and read the body. When `timings` (nettiming.NetworkTimings)
+        is given the request is recorded in it, tagged with `variant` and
+        `segment`, whether it succeeds or not.
+        """
+        if timings is None:
+            return self.get(uri, headers=headers)
+
+        from nettiming import RequestTiming
+        _connectTimes.last = None
+        start = time.perf_counter()
+        marks = {}
+
+        def headersReceived(response, *args, **kwargs):
+            # Response hooks run before the body is read
+            marks['ttfb'] = time.perf_counter() - start
+
+        status = 0
+        size = None
+        try:
+            response = self.get(uri, headers=headers, hooks={'response': headersReceived})
+            status = response.status_code
+            size = len(response.content)
+            return response
+        finally:
+            total = time.perf_counter() - start
+            timings.record(RequestTiming(uri, status, size, marks.get('ttfb', total), total,
+                                         _connectTimes.last, variant, segment))
+
+    def download(self, uri, httpRange=None, base_url=None, retries=None, delay=None,
+                 timings=None, variant=None, segment=None, headers=None):
+        """
+        Like download_url(), but returns the successful response (body read)
+        instead of its content. `retries` and `delay` override the attempt
+        count and base backoff delay of the retry policy.
+        """
+        from requests.exceptions import RequestException
+        policy = self.retry_policy
+        attempts = max(1, policy.attempts if retries is None else retries)
+        if headers is None:
+            headers = self.headers(uri, base_url, httpRange)
+
+        for attempt in range(attempts):
+            retryAfter = None
+            try:
+                response = self.timed_get(uri, headers, timings, variant, segment)
+                if response.ok:
+                    logging.debug("Successfully downloaded: %s", uri)
+                    return response
+                if not policy.is_retryable(response.status_code):
+                    logging.error("Giving up on %s: HTTP %d", uri, response.status_code)
+                    return None
+                retryAfter = parse_retry_after(response.headers.get('Retry-After'))
+                logging.warning("Attempt %d/%d failed for %s: HTTP %d", attempt + 1, attempts, uri,
+                                response.status_code)
+            except CircuitOpenError as e:
+                logging.error("Giving up on %s: %s", uri, e)
+                return None
+            except RequestException as e:
+                logging.warning("Attempt %d/%d failed for %s: %s", attempt + 1, attempts, uri, e)
+            if attempt + 1 < attempts:
+                time.sleep(policy.delay(attempt, retryAfter, delay))
+
+        logging.error("All %d attempts failed for %s", attempts, uri)
+        return None
+
+    def download_url(self, uri, httpRange=None, base_url=None, retries=None, delay=None,
+                     timings=None, variant=None, segment=None):
+        response = self.download(uri, httpRange, base_url, retries, delay, timings, variant, segment)
+        return response.content if response is not None else None
+
+    def load_with_retries(self, url, retries=None, delay=None, referer=None):
+        return self.download_url(url, base_url=referer, retries=retries, delay=delay)
+
+    def get_parsed(self, uri, parse, base_url=None, timings=None, variant=None):
+        """
+        Download `uri` and return parse(content), or None when the download
+        fails. When the server validates the resource with an ETag or
+        Last-Modified header, both are remembered along with the parsed
+        value. Later loads send If-None-Match/If-Modified-Since, and a 304
+        returns that same parsed object, neither transferred nor parsed
+        again, so callers must not modify it.
+        """
+        headers = self.headers(uri, base_url)
+        entry = self.validated.get(uri)
+        if entry is not None:
+            etag, lastModified, value = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if lastModified:
+                headers['If-Modified-Since'] = lastModified
+
+        response = self.download(uri, timings=timings, variant=variant, headers=headers)
+        if response is None:
+            return None
+        if response.status_code == 304 and entry is not None:
+            logging.debug("Not modified: %s", uri)
+            return value
+
+        value = parse(response.content)
+        etag = response.headers.get('ETag')
+        lastModified = response.headers.get('Last-Modified')
+        if etag or lastModified:
+            self.validated.put(uri, (etag, lastModified, value))
+        return value
+
+    def get_etag(self, uri, base_url=None):
+        """ETag of the resource at `uri` from a HEAD request, None when the server sends none."""
+        from requests.exceptions import RequestException
+        try:
+            response = self.head(uri, headers=self.headers(uri, base_url))
+            if response.ok:
+                return response.headers.get('ETag')
+        except (RequestException, CircuitOpenError) as e:
+            logging.warning("Could not get the ETag of %s: %s", uri, e)
+        return None
+
+    def get_content_length(self, uri, base_url=None):
+        """
+        Size in bytes of the resource at `uri` without transferring it: the
+        Content-Length of a HEAD response, or else the total in the
+        Content-Range of a 0-byte Range request whose body is never read.
+        None when neither gives a size.
+        """
+        from requests.exceptions import RequestException
+        try:
+            response = self.head(uri, headers=self.headers(uri, base_url))
+            length = response.headers.get('Content-Length')
+            if response.ok and length is not None and response.headers.get('Content-Encoding', 'identity') == 'identity':
+                return int(length)
+
+            response = self.get(uri, headers=self.headers(uri, base_url, 'bytes=0-0'), stream=True)
+            try:
+                if response.status_code == 206:
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                    if total.isdigit():
+                        return int(total)
+                elif response.ok and response.headers.get('Content-Length') is not None:
+                    # Range ignored; the length is still right, drop the body
+                    return int(response.headers['Content-Length'])
+            finally:
+                response.close()
+        except (RequestException, CircuitOpenError, ValueError) as e:
+            logging.warning("Could not get the size of %s: %s", uri, e)
+        return None
+
+    def verify_url(self, url, base_url=None):
+        """
+        Verify URL accessibility using exact curl-matching headers.
+        """
+        headers = self.headers(url, base_url)
+
+        try:
+            response = self.head(url, headers=headers)
+
+            if response.status_code == 200:
+                logging.info("URL is accessible: %s", url)
+                return True
+            else:
+                # If HEAD fails, try GET as fallback
+                response = self.get(url, headers=headers)
+                if response.status_code == 200:
+                    logging.info("URL is accessible (via GET): %s", url)
+                    return True
+
+                logging.warning("URL returned status code %s: %s", response.status_code, url)
+                return False
+
+        except Exception as e:
+            logging.error("Error accessing URL %s: %s", url, e)
+            return False
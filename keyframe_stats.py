@@ -0,0 +1,209 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import math
+from array import array
+
+from parsers.timestamp import ticksToSeconds
+
+
+class KeyframeStats(object):
+    """
+    Keyframe interval statistics over one or more frame timelines
+    (parsers.frame.FrameTimeline), one per segment.
+
+    add_timeline() locates the keyframes with bytearray.find on the keyframe
+    column, so its Python-level work is per keyframe rather than per frame.
+    Feeding the timelines of consecutive segments in order gives statistics
+    for the whole range, including the GOPs that straddle segment
+    boundaries; a fresh instance per segment gives per-segment figures.
+
+    merge() combines the statistics of two ranges, the second one after the
+    first, so ranges can be summarized separately (by different workers,
+    say) and merged later: merge is associative and a fresh instance is its
+    identity, so merging per-segment statistics in order in any grouping
+    gives the same result as feeding every timeline to one instance. When
+    the segment indexes show that segments were skipped between two ranges,
+    as with sampling, no interval or GOP is counted across the gap: they are
+    combined as disjoint runs. Times are 90 kHz ticks.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        # PTS of every keyframe, and the interval from the previous keyframe
+        # in the same run of consecutive segments
+        self.positions = array('q')
+        self.intervals = array('q')
+        # GOP length in frames -> number of complete GOPs of that length
+        self.gop_histogram = {}
+        self.total = 0
+        self.total_squares = 0
+        self.segments = 0
+        self.segments_starting_with_keyframe = 0
+        # Indexes of the first and last segment of the range, None when not known
+        self.first_segment = None
+        self.last_segment = None
+        # Frames before the first keyframe, and since the last one (None
+        # before the first one); they complete the GOPs straddling the ends
+        # of the range when it is merged with its neighbours. Either is also
+        # None once a gap in the segments cuts the GOP it belongs to short.
+        self._frames_before_keyframe = 0
+        self._frames_since_keyframe = None
+
+    def add_timeline(self, timeline, segment_index=None):
+        keyframes = timeline.keyframes
+        pts = timeline.pts
+        count = len(timeline)
+
+        segment = KeyframeStats()
+        segment.segments = 1
+        segment.frames = count
+        segment.first_segment = segment.last_segment = segment_index
+        if count and keyframes[0]:
+            segment.segments_starting_with_keyframe = 1
+
+        previous = -1
+        index = keyframes.find(1)
+        while index != -1:
+            segment._add_keyframe(pts[index])
+            if previous >= 0:
+                segment._add_gop(index - previous)
+            else:
+                segment._frames_before_keyframe = index
+            previous = index
+            index = keyframes.find(1, index + 1)
+
+        if previous >= 0:
+            segment._frames_since_keyframe = count - previous
+        else:
+            segment._frames_before_keyframe = count
+        return self.merge(segment)
+
+    def follows(self, other):
+        """Whether the range of `other` starts right after this one (or either is empty or unindexed)."""
+        if not self.segments or not other.segments:
+            return True
+        if self.last_segment is None or other.first_segment is None:
+            return True
+        return other.first_segment == self.last_segment + 1
+
+    def merge(self, other):
+        """Append the statistics of `other`, covering a range after this one; returns self."""
+        adjacent = self.follows(other)
+        if self.positions:
+            # Whether the GOP open at the end of this range runs unbroken into other
+            continued = (adjacent and self._frames_since_keyframe is not None and
+                         other._frames_before_keyframe is not None)
+            if other.positions:
+                if continued:
+                    self._add_interval(other.positions[0] - self.positions[-1])
+                    self._add_gop(self._frames_since_keyframe + other._frames_before_keyframe)
+                self._frames_since_keyframe = other._frames_since_keyframe
+            elif continued:
+                self._frames_since_keyframe += other.frames
+            else:
+                self._frames_since_keyframe = None
+        else:
+            if adjacent and other._frames_before_keyframe is not None and self._frames_before_keyframe is not None:
+                self._frames_before_keyframe += other._frames_before_keyframe
+            else:
+                self._frames_before_keyframe = None
+            self._frames_since_keyframe = other._frames_since_keyframe
+
+        if other.segments:
+            if not self.segments:
+                self.first_segment = other.first_segment
+            self.last_segment = other.last_segment
+        self.positions.extend(other.positions)
+        self.intervals.extend(other.intervals)
+        for length, count in other.gop_histogram.items():
+            self.gop_histogram[length] = self.gop_histogram.get(length, 0) + count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.frames += other.frames
+        self.segments += other.segments
+        self.segments_starting_with_keyframe += other.segments_starting_with_keyframe
+        return self
+
+    def to_state(self):
+        """JSON-serializable form of the statistics, read back by from_state()."""
+        return {
+            'frames': self.frames,
+            'positions': list(self.positions),
+            'intervals': list(self.intervals),
+            'gop_histogram': [[length, count] for length, count in self.gop_histogram.items()],
+            'segments': self.segments,
+            'segments_starting_with_keyframe': self.segments_starting_with_keyframe,
+            'frames_before_keyframe': self._frames_before_keyframe,
+            'frames_since_keyframe': self._frames_since_keyframe,
+            'first_segment': self.first_segment,
+            'last_segment': self.last_segment,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        stats.positions.extend(state['positions'])
+        for interval in state['intervals']:
+            stats._add_interval(interval)
+        stats.frames = state['frames']
+        stats.gop_histogram = {length: count for length, count in state['gop_histogram']}
+        stats.segments = state['segments']
+        stats.segments_starting_with_keyframe = state['segments_starting_with_keyframe']
+        stats._frames_before_keyframe = state['frames_before_keyframe']
+        stats._frames_since_keyframe = state['frames_since_keyframe']
+        stats.first_segment = state['first_segment']
+        stats.last_segment = state['last_segment']
+        return stats
+
+    @property
+    def count(self):
+        return len(self.positions)
+
+    @property
+    def min_interval(self):
+        return min(self.intervals) if self.intervals else None
+
+    @property
+    def max_interval(self):
+        return max(self.intervals) if self.intervals else None
+
+    @property
+    def mean_interval(self):
+        return self.total / float(len(self.intervals)) if self.intervals else None
+
+    @property
+    def stddev_interval(self):
+        if not self.intervals:
+            return None
+        n = len(self.intervals)
+        variance = (self.total_squares - self.total * self.total / float(n)) / n
+        return math.sqrt(max(variance, 0.0))
+
+    def to_dict(self):
+        def seconds(ticks):
+            return None if ticks is None else ticksToSeconds(ticks)
+
+        return {
+            'keyframes': self.count,
+            'frames': self.frames,
+            'min_interval': seconds(self.min_interval),
+            'max_interval': seconds(self.max_interval),
+            'mean_interval': seconds(self.mean_interval),
+            'stddev_interval': seconds(self.stddev_interval),
+            'gop_histogram': {str(k): v for k, v in sorted(self.gop_histogram.items())},
+        }
+
+    def _add_keyframe(self, position):
+        if self.positions:
+            self._add_interval(position - self.positions[-1])
+        self.positions.append(position)
+
+    def _add_interval(self, interval):
+        self.intervals.append(interval)
+        self.total += interval
+        self.total_squares += interval * interval
+
+    def _add_gop(self, length):
+        self.gop_histogram[length] = self.gop_histogram.get(length, 0) + 1
@@ -0,0 +1,176 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import m3u8
+
+
+class VariantAudit(object):
+    """
+    Segment sizes of one variant and the bitrates they imply, in bits per
+    second. Segments whose size could not be found are kept with size None
+    and left out of the bitrates.
+    """
+
+    def __init__(self, url, bandwidth):
+        self.url = url
+        # Declared BANDWIDTH, None for a media playlist analyzed on its own
+        self.bandwidth = bandwidth
+        # (segment index, EXTINF duration, size in bytes)
+        self.segments = []
+        self.error = None
+
+    def bitrates(self):
+        return [(index, size * 8 / duration) for index, duration, size in self.segments
+                if size is not None and duration > 0]
+
+    @property
+    def unknown_sizes(self):
+        return sum(1 for _, _, size in self.segments if size is None)
+
+    @property
+    def peak_bitrate(self):
+        bitrates = self.bitrates()
+        return max(bitrate for _, bitrate in bitrates) if bitrates else None
+
+    @property
+    def peak_segment(self):
+        bitrates = self.bitrates()
+        return max(bitrates, key=lambda item: item[1])[0] if bitrates else None
+
+    @property
+    def average_bitrate(self):
+        known = [(duration, size) for _, duration, size in self.segments if size is not None]
+        duration = sum(duration for duration, _ in known)
+        return sum(size for _, size in known) * 8 / duration if duration > 0 else None
+
+    @property
+    def exceeds_bandwidth(self):
+        peak = self.peak_bitrate
+        return bool(self.bandwidth) and peak is not None and peak > self.bandwidth
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'bandwidth': self.bandwidth,
+            'segments': len(self.segments),
+            'unknown_sizes': self.unknown_sizes,
+            'peak_bitrate': self.peak_bitrate,
+            'peak_segment': self.peak_segment,
+            'average_bitrate': self.average_bitrate,
+            'exceeds_bandwidth': self.exceeds_bandwidth,
+            'segment_bitrates': {str(index): bitrate for index, bitrate in self.bitrates()},
+            'error': self.error,
+        }
+
+
+class LadderAudit(object):
+    """Outcome of audit_ladder(): one VariantAudit per variant, in playlist order."""
+
+    def __init__(self, url):
+        self.url = url
+        self.variants = []
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and not any(variant.exceeds_bandwidth for variant in self.variants)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'ok': self.ok,
+            'error': self.error,
+            'variants': [variant.to_dict() for variant in self.variants],
+        }
+
+
+def audit_ladder(fetcher, url, jobs=16):
+    """
+    Measure the bitrate of every segment of every variant of the stream at
+    `url` without downloading media: sizes come from the Content-Length of
+    HEAD requests (or the total of a 0-byte Range request, see
+    Fetcher.get_content_length) issued `jobs` at a time, or from
+    EXT-X-BYTERANGE when present. Only playlists are downloaded.
+    """
+    audit = LadderAudit(url)
+    playlist = _load(fetcher, url)
+    if playlist is None:
+        audit.error = "Failed to download playlist {}".format(url)
+        return audit
+
+    if playlist.is_variant:
+        targets = [(urljoin(url, variant.uri), variant.stream_info.bandwidth) for variant in playlist.playlists]
+    else:
+        targets = [(url, None)]
+
+    probes = []
+    for variant_url, bandwidth in targets:
+        variant = VariantAudit(variant_url, bandwidth)
+        audit.variants.append(variant)
+        media = playlist if variant_url == url else _load(fetcher, variant_url)
+        if media is None:
+            variant.error = "Failed to download playlist {}".format(variant_url)
+            continue
+        for index, segment in enumerate(media.segments):
+            size = _byterange_length(segment.byterange)
+            variant.segments.append((index, segment.duration or 0, size))
+            if size is None:
+                probes.append((variant, index, urljoin(variant_url, segment.uri)))
+
+    if probes:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            sizes = pool.map(lambda probe: fetcher.get_content_length(probe[2], url), probes)
+            for (variant, index, _), size in zip(probes, sizes):
+                _, duration, _ = variant.segments[index]
+                variant.segments[index] = (index, duration, size)
+
+    for variant in audit.variants:
+        if variant.unknown_sizes:
+            logging.warning("Size unknown for %d segments of %s", variant.unknown_sizes, variant.url)
+    return audit
+
+
+def print_ladder_audit(audit, out):
+    print("** Bitrate ladder audit **", file=out)
+    if audit.error:
+        print("Error: {}".format(audit.error), file=out)
+        return
+
+    for variant in audit.variants:
+        declared = "{} bps".format(variant.bandwidth) if variant.bandwidth else "not declared"
+        print("\nVariant {} (BANDWIDTH {})".format(variant.url, declared), file=out)
+        if variant.error:
+            print("\tError: {}".format(variant.error), file=out)
+            continue
+        print("\tSegments: {} ({} of unknown size)".format(len(variant.segments), variant.unknown_sizes), file=out)
+        if variant.peak_bitrate is None:
+            continue
+        print("\tPeak bitrate: {:.0f} bps (segment {})".format(variant.peak_bitrate, variant.peak_segment), file=out)
+        print("\tAverage bitrate: {:.0f} bps".format(variant.average_bitrate), file=out)
+        if variant.exceeds_bandwidth:
+            print("\tWarning: peak bitrate exceeds the declared BANDWIDTH by {:.1f}%".format(
+                (variant.peak_bitrate / variant.bandwidth - 1) * 100), file=out)
+
+
+def _load(fetcher, url):
+    return fetcher.get_parsed(url, _parse)
+
+
+def _parse(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return m3u8.loads(data)
+
+
+def _byterange_length(byterange):
+    if not byterange:
+        return None
+    try:
+        return int(byterange.split('@')[0])
+    except ValueError:
+        return None
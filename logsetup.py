@@ -0,0 +1,98 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import atexit
+import copy
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_LOG_FILE = "hls_analysis.log"
+
+_listener = None
+_exceptionFormatter = logging.Formatter()
+
+
+def _create_queue_handler(log_queue):
+    # logging.handlers pulls in socket and pickle; it is imported here so
+    # that `hls-analyzer.py -h` does not pay for it.
+    import logging.handlers
+
+    class DeferredQueueHandler(logging.handlers.QueueHandler):
+        """
+        QueueHandler that only renders what cannot wait.
+
+        The message arguments and the traceback are rendered in the calling
+        thread, so later changes to mutable arguments do not alter the message
+        and the queue does not keep traceback frames alive. Applying the
+        formatter (timestamp, level) and the file I/O are left to the
+        listener thread.
+        """
+
+        def prepare(self, record):
+            record = copy.copy(record)
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                if not record.exc_text:
+                    record.exc_text = _exceptionFormatter.formatException(record.exc_info)
+                record.exc_info = None
+            return record
+
+    return DeferredQueueHandler(log_queue)
+
+
+def setup_logging(log_file=DEFAULT_LOG_FILE, level=logging.INFO, console=True):
+    """
+    Route the root logger through a queue drained by a background listener.
+
+    `log_file` may be None or empty to disable the file handler. Calling this
+    again replaces the previous configuration.
+    """
+    import logging.handlers
+    import queue
+
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_create_queue_handler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush pending records and stop the background listener, if any."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def parse_level(name):
+    """Map a level name such as "debug" or "WARNING" to its numeric value."""
+    level = logging.getLevelName(str(name).upper())
+    if not isinstance(level, int):
+        raise ValueError("Unknown log level: {}".format(name))
+    return level
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,182 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import threading
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+# Upper bounds of the histogram buckets; values above the last bound go to
+# an overflow bucket
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+THROUGHPUT_BUCKETS_MBPS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram(object):
+    """Fixed-bucket histogram with count, sum, min and max; merge() adds another one with the same bounds."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (capped at the largest value seen)."""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = ["<={}".format(bound) for bound in self.bounds] + [">{}".format(self.bounds[-1])]
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class RequestTiming(object):
+    """
+    Timing of one HTTP request, in seconds: `ttfb` until the response
+    headers arrived, `total` until the body was read. `connect` is the
+    connection set-up time where the HTTP stack reports it, None otherwise.
+    `variant` and `segment` tag requests made for a variant (its bandwidth)
+    and one of its segments (its index).
+    """
+
+    def __init__(self, url, status, size, ttfb, total, connect=None, variant=None, segment=None):
+        self.url = url
+        self.host = urlparse(url).netloc.lower()
+        self.status = status
+        self.size = size
+        self.ttfb = ttfb
+        self.total = total
+        self.connect = connect
+        self.variant = variant
+        self.segment = segment
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 400
+
+    @property
+    def throughput(self):
+        """Body transfer rate in bits per second, None when too fast to measure."""
+        transfer = self.total - self.ttfb
+        if not self.size or transfer <= 0:
+            return None
+        return self.size * 8 / transfer
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'host': self.host,
+            'variant': self.variant,
+            'segment': self.segment,
+            'status': self.status,
+            'bytes': self.size,
+            'connect': self.connect,
+            'ttfb': self.ttfb,
+            'total': self.total,
+            'throughput': self.throughput,
+        }
+
+
+class TimingSummary(object):
+    """Histograms of connect time, TTFB, total time (ms) and throughput (Mbit/s) of a group of requests."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.connect = Histogram(LATENCY_BUCKETS_MS)
+        self.ttfb = Histogram(LATENCY_BUCKETS_MS)
+        self.total = Histogram(LATENCY_BUCKETS_MS)
+        self.throughput = Histogram(THROUGHPUT_BUCKETS_MBPS)
+
+    def add(self, timing):
+        self.requests += 1
+        if not timing.ok:
+            self.errors += 1
+            return
+        self.bytes += timing.size or 0
+        if timing.connect is not None:
+            self.connect.add(timing.connect * 1000)
+        self.ttfb.add(timing.ttfb * 1000)
+        self.total.add(timing.total * 1000)
+        if timing.throughput is not None:
+            self.throughput.add(timing.throughput / 1e6)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'connect_ms': self.connect.to_dict(),
+            'ttfb_ms': self.ttfb.to_dict(),
+            'total_ms': self.total.to_dict(),
+            'throughput_mbps': self.throughput.to_dict(),
+        }
+
+
+class NetworkTimings(object):
+    """
+    Collects the RequestTiming of every fetch of an analysis run and keeps
+    per-host and per-variant summaries. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.hosts = {}
+        self.variants = {}
+        self._lock = threading.Lock()
+
+    def record(self, timing):
+        with self._lock:
+            self.requests.append(timing)
+            self.hosts.setdefault(timing.host, TimingSummary()).add(timing)
+            if timing.variant is not None:
+                self.variants.setdefault(timing.variant, TimingSummary()).add(timing)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'hosts': {host: summary.to_dict() for host, summary in self.hosts.items()},
+                'variants': {str(variant): summary.to_dict() for variant, summary in self.variants.items()},
+                'requests': [timing.to_dict() for timing in self.requests],
+            }
@@ -3,9 +3,8 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from bitreader import BitReader
 from parsers.payloadreader import PayloadReader
-from parsers.frame import Frame
+from parsers.timestamp import TIMESCALE
 
 class ADTSReader(PayloadReader):
 
@@ -13,19 +12,22 @@ class ADTSReader(PayloadReader):
 
     ADTS_HEADER_SIZE = 5
     ADTS_SYNC_SIZE = 2
-    ADTS_CRC_SIZE = 2
 
-    STATE_FIND_SYNC = 1
-    STATE_READ_HEADER = 2
-    STATE_READ_FRAME = 3
+    SAMPLES_PER_FRAME = 1024
 
     def __init__(self):
         PayloadReader.__init__(self)
         self.channels = 0
         self.sampleRate = 0
-        self.frameDuration = 0
-        self.timeUs = -1
-        self.currentFrameSize = 0
+        self.sampleRateIndex = -1
+        self.pts = -1
+        # Timestamps are derived from the last PES PTS plus the samples
+        # decoded since, so they stay exact in 90 kHz ticks
+        self.basePts = -1
+        self.baseSamples = 0
+        # Bytes at the start of the buffer left over from the previous PES
+        # packet: the start of a frame that is timed from the previous PTS
+        self.carried = 0
         self.firstTimeStamp = -1
         self.framesInfo = ""
 
@@ -36,75 +38,88 @@ class ADTSReader(PayloadReader):
         return self.firstTimeStamp
 
     def getLastPTS(self):
-        return self.timeUs
+        return self.pts
 
     def getFormat(self):
         return "Audio (AAC) - Sample Rate: {}, Channels: {}".format(self.sampleRate, self.channels)
 
-    def consumeData(self, pts):
-        if(pts >= 0):
-            self.timeUs = pts
-
-        if(self.firstTimeStamp == -1):
-            self.firstTimeStamp = self.timeUs;
-
-        offset = 0
-        state = self.STATE_FIND_SYNC
-
-        while(offset < len(self.dataBuffer)):
-            if(state == self.STATE_FIND_SYNC):
+    def consumeData(self, pts, dts=-1):
+        # `pts` belongs to the first frame starting in this PES packet; a
+        # frame carried over from the previous one keeps its extrapolated PTS
+        rebased = pts < 0
+
+        # Hop from one ADTS header to the next using aac_frame_length; only
+        # fall back to scanning for a syncword when a frame is not followed
+        # by another header.
+        data = self.dataBuffer
+        limit = len(data) - (self.ADTS_SYNC_SIZE + self.ADTS_HEADER_SIZE)
+        offset = self._findNextSync(0)
+
+        while(offset <= limit):
+            if(not rebased and offset >= self.carried):
+                self._rebase(pts)
+                rebased = True
+            if(data[offset] != 0xFF or (data[offset + 1] & 0xF6) != 0xF0):
                 offset = self._findNextSync(offset)
-                if(offset < len(self.dataBuffer)):
-                    state = self.STATE_READ_HEADER
+                continue
 
-            elif(state == self.STATE_READ_HEADER):
-                if(len(self.dataBuffer) - offset < (self.ADTS_HEADER_SIZE + self.ADTS_SYNC_SIZE)):
-                    break
-                self._parseAACHeader(offset)
-                state = self.STATE_READ_FRAME
+            frameLength = self._parseAACHeader(offset)
+            if(frameLength < self.ADTS_SYNC_SIZE + self.ADTS_HEADER_SIZE):
+                # Corrupt header, look for the next syncword
+                offset = self._findNextSync(offset + 1)
+                continue
+            if(offset + frameLength > len(data)):
+                # Frame continues in the next PES packet
+                break
 
-            elif(state == self.STATE_READ_FRAME):
-                if(len(self.dataBuffer) - offset < (self.ADTS_SYNC_SIZE + self.ADTS_HEADER_SIZE + self.currentFrameSize)):
-                    break
-                offset += (self.ADTS_SYNC_SIZE + self.ADTS_HEADER_SIZE + self.currentFrameSize)
-                state = self.STATE_FIND_SYNC
+            self.frames.add("I", self.pts, True, frameLength)
+            self.baseSamples += self.SAMPLES_PER_FRAME
+            self.pts = self.basePts + self.baseSamples * TIMESCALE // self.sampleRate
+            offset += frameLength
 
-                self.timeUs = self.timeUs + self.frameDuration
-                self.frames.append(Frame("I", self.timeUs))
+        if(not rebased and offset >= self.carried):
+            self._rebase(pts)
 
         self.dataBuffer = self.dataBuffer[offset:]
+        self.carried = len(self.dataBuffer)
 
-    def _findNextSync(self, index):
-        limit = len(self.dataBuffer) - 1
+    def _rebase(self, pts):
+        if(self.firstTimeStamp == -1):
+            self.firstTimeStamp = pts
+        self.pts = pts
+        self.basePts = pts
+        self.baseSamples = 0
 
-        for i in range(index, limit):
-            dataRead = (((self.dataBuffer[i]) << 8) | (self.dataBuffer[i + 1]))
+    def _findNextSync(self, index):
+        data = self.dataBuffer
+        limit = len(data) - 1
 
-            if ((dataRead & 0xfff6) == 0xfff0):
+        i = data.find(b'\xff', index, limit)
+        while(i != -1):
+            if((data[i + 1] & 0xF6) == 0xF0):
                 return i
+            i = data.find(b'\xff', i + 1, limit)
 
-        return len(self.dataBuffer);
+        return len(data);
 
     def _parseAACHeader(self, start):
-        aacHeaderParser = BitReader(self.dataBuffer[start:start + self.ADTS_SYNC_SIZE + self.ADTS_HEADER_SIZE])
-
-        aacHeaderParser.skipBits(15)
-        hasCrc = (aacHeaderParser.readBit() == 0)
-        aacHeaderParser.skipBits(2)
-        sampleRateIndex = aacHeaderParser.readBits(4)
-        if(sampleRateIndex < len(self.ADTS_SAMPLE_RATES)):
-            self.sampleRate = self.ADTS_SAMPLE_RATES[sampleRateIndex]
-        else:
-            self.sampleRate = sampleRateIndex
-
-        self.frameDuration = (1000000 * 1024) / self.sampleRate;
-        self.frames.append(Frame("I", self.timeUs))
-
-        aacHeaderParser.skipBits(1)
-        self.channels = aacHeaderParser.readBits(3)
-
-        aacHeaderParser.skipBits(4)
-        self.currentFrameSize = aacHeaderParser.readBits(13) - self.ADTS_HEADER_SIZE - self.ADTS_SYNC_SIZE;
-
-        if (hasCrc):
-            self.currentFrameSize -= self.ADTS_CRC_SIZE;
+        """
+        Decode the fixed and variable header fields at `start` with integer
+        masks and return aac_frame_length (header, CRC and payload).
+        """
+        data = self.dataBuffer
+        b2 = data[start + 2]
+        b3 = data[start + 3]
+
+        sampleRateIndex = (b2 >> 2) & 0x0F
+        if(sampleRateIndex != self.sampleRateIndex):
+            self.sampleRateIndex = sampleRateIndex
+            if(sampleRateIndex < len(self.ADTS_SAMPLE_RATES)):
+                self.sampleRate = self.ADTS_SAMPLE_RATES[sampleRateIndex]
+            else:
+                self.sampleRate = sampleRateIndex
+            self._rebase(self.pts)
+
+        self.channels = ((b2 & 0x01) << 2) | (b3 >> 6)
+
+        return ((b3 & 0x03) << 11) | (data[start + 4] << 3) | (data[start + 5] >> 5)
@@ -3,13 +3,60 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
+from array import array
+
 class Frame:
 
-    def __init__(self, frameType, timeUs):
+    def __init__(self, frameType, pts, keyframe=None, size=0, sliceTypes=None, dts=None):
         self.type = frameType
-        self.timeUs = timeUs
+        # Presentation and decoding time, in 90 kHz ticks
+        self.pts = pts
+        self.dts = pts if dts is None else dts
+        # Bytes of the access unit, and the slice types of a video picture
+        self.size = size
+        self.sliceTypes = sliceTypes if sliceTypes is not None else (frameType,)
+        # Defaults to "any I frame"; codecs that can tell random access
+        # points apart from other intra pictures (HEVC IRAP) pass it explicitly
+        self.keyframe = (frameType == "I") if keyframe is None else keyframe
 
     def isKeyframe(self):
-        if self.type == "I":
-            return True
-        return False
+        return self.keyframe
+
+
+class FrameTimeline(object):
+    """
+    The frames of a track, stored column-wise: PTS, DTS (90 kHz ticks) and
+    sizes in int64 arrays, keyframe flags in a bytearray. Indexing and
+    iteration build Frame objects on demand; bulk consumers should use the
+    columns directly.
+    """
+
+    def __init__(self):
+        self.pts = array('q')
+        self.dts = array('q')
+        self.sizes = array('q')
+        self.keyframes = bytearray()
+        self.types = []
+        self.sliceTypes = []
+
+    def add(self, frameType, pts, keyframe=None, size=0, sliceTypes=None, dts=None):
+        self.types.append(frameType)
+        self.pts.append(pts)
+        self.dts.append(pts if dts is None else dts)
+        self.sizes.append(size)
+        self.keyframes.append((frameType == "I") if keyframe is None else bool(keyframe))
+        self.sliceTypes.append(sliceTypes if sliceTypes is not None else (frameType,))
+
+    def append(self, frame):
+        self.add(frame.type, frame.pts, frame.keyframe, frame.size, frame.sliceTypes, frame.dts)
+
+    def __len__(self):
+        return len(self.pts)
+
+    def __getitem__(self, index):
+        return Frame(self.types[index], self.pts[index], self.keyframes[index] == 1,
+                     self.sizes[index], self.sliceTypes[index], self.dts[index])
+
+    def __iter__(self):
+        for i in range(len(self.pts)):
+            yield self[i]
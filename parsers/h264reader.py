@@ -3,12 +3,10 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from bitreader import BitReader
-from parsers.payloadreader import PayloadReader
+from parsers.nalreader import NALUnitReader
 from fractions import Fraction
-from parsers.frame import Frame
 
-class H264Reader(PayloadReader):
+class H264Reader(NALUnitReader):
 
     NAL_UNIT_TYPE_SLICE = 1
     NAL_UNIT_TYPE_DPA = 2
@@ -48,15 +46,17 @@ class H264Reader(PayloadReader):
          [3, 2],
          [2, 1]]
 
+    # Reader attributes set by an SPS, as memoized in the ParameterSetCache
+    SPS_FIELDS = ('profileId', 'levelId', 'frameWidth', 'frameHeight', 'numRefFrames',
+                  'aspectRatioNum', 'aspectRatioDen', 'displayAspectRatio')
+
     def __init__(self):
-        PayloadReader.__init__(self)
+        NALUnitReader.__init__(self)
         self.profileId = 0
         self.levelId = 0
         self.frameWidth = 0
         self.frameHeight = 0
         self.numRefFrames = 0
-        self.firstTimeStamp = -1
-        self.timeUs = -1
         self.aspectRatioNum = 1
         self.aspectRatioDen = 1
         self.displayAspectRatio = Fraction(1, 1)
@@ -64,44 +64,11 @@ class H264Reader(PayloadReader):
     def getMimeType(self):
         return "video/avc"
 
-    def getFirstPTS(self):
-        return self.firstTimeStamp
-
-    def getLastPTS(self):
-        return self.timeUs
-
     def getFormat(self):
         return "Video (H.264) - Profile: {}, Level: {}, Resolution: {}x{}, Encoded aspect ratio: {}/{}, Display aspect ratio: {}".format(self._getProfileName(self.profileId), self.levelId, self.frameWidth, self.frameHeight, self.aspectRatioNum, self.aspectRatioDen, self.displayAspectRatio)
 
-    def consumeData(self, pts):
-        if(self.firstTimeStamp == -1):
-            self.firstTimeStamp = pts;
-
-        if(pts != -1):
-            self.timeUs = pts
-
-        if(len(self.dataBuffer) > 0):
-            offset = self._findNextNALUnit(0)
-            nextNalUnit = 0
-            while (nextNalUnit < len(self.dataBuffer)):
-                nextNalUnit = self._findNextNALUnit(offset + 3)
-
-                if(nextNalUnit < len(self.dataBuffer)):
-                    self._processNALUnit(offset, nextNalUnit, self.dataBuffer[offset + 3] & 0x1F)
-                    offset = nextNalUnit
-
-            self.dataBuffer = self.dataBuffer[offset:]
-
-    def _findNextNALUnit(self, index):
-        limit = len(self.dataBuffer) - 3
-        for i in range(index, limit):
-            if (self.dataBuffer[i] == 0
-                    and self.dataBuffer[i + 1] == 0
-                    and self.dataBuffer[i + 2] == 1):
-                
-                return i
-
-        return len(self.dataBuffer);
+    def _getNALUnitType(self, start):
+        return self.dataBuffer[start + 3] & 0x1F
 
     def _processNALUnit(self, start, limit, nalType):
         if(nalType == self.NAL_UNIT_TYPE_SPS):
@@ -109,11 +76,11 @@ class H264Reader(PayloadReader):
         elif(nalType == self.NAL_UNIT_TYPE_AUD):
             self._parseAUDNALUnit(start, limit)
         elif(nalType == self.NAL_UNIT_TYPE_IDR):
-            self._addNewFrame(self.SLICE_TYPE_I, self.timeUs)
+            self._parseSliceNALUnit(start, limit, True)
         elif(nalType == self.NAL_UNIT_TYPE_SEI):
             self._parseSEINALUnit(start, limit);
         elif(nalType == self.NAL_UNIT_TYPE_SLICE):
-            self._parseSliceNALUnit(start, limit)
+            self._parseSliceNALUnit(start, limit, False)
 
     def _getSliceTypeName(self, sliceType):
         if (sliceType > 4):
@@ -166,8 +133,7 @@ class H264Reader(PayloadReader):
         return profileId
 
     def _parseSEINALUnit(self, start, limit):
-        seiParser = BitReader(self.dataBuffer[start:limit])
-        seiParser.skipBytes(4)
+        seiParser = self._getRBSPReader(start, limit, self.SLICE_HEADER_WINDOW)
 
         while True:
             data = seiParser.readUnsignedByte()
@@ -180,27 +146,25 @@ class H264Reader(PayloadReader):
             if (data != 0xFF):
                 break;
 
-    def _parseSliceNALUnit(self, start, limit):
-        sliceParser = BitReader(self.dataBuffer[start:limit])
-        sliceParser.skipBytes(4)
-        sliceParser.readUnsignedExpGolombCodedInt()
+    def _parseSliceNALUnit(self, start, limit, isIDR):
+        sliceParser = self._getRBSPReader(start, limit, self.SLICE_HEADER_WINDOW)
+        firstMbInSlice = sliceParser.readUnsignedExpGolombCodedInt()
         sliceType = sliceParser.readUnsignedExpGolombCodedInt()
-        self._addNewFrame(sliceType, self.timeUs)
-
-    def _addNewFrame(self, frameType, timeUs):
-        self.frames.append(Frame(self._getSliceTypeName(frameType), timeUs))
+        self._addSlice(self._getSliceTypeName(sliceType), isIDR, firstMbInSlice == 0)
 
     def _parseAUDNALUnit(self, start, limit):
-        audParser = BitReader(self.dataBuffer[start:limit])
-        audParser.skipBytes(4)
+        # An access unit delimiter starts a new access unit
+        self._endAccessUnit()
 
     def _parseSPSNALUnit(self, start, limit):
-        spsParser = BitReader(self.dataBuffer[start:limit])
-        spsParser.skipBytes(4)
+        self._activateSPS(self._parseParameterSet(start, limit, self._readSPS, self.SPS_FIELDS))
+
+    def _readSPS(self, start, limit):
+        spsParser = self._getRBSPReader(start, limit, self.PARAMETER_SET_WINDOW)
 
         self.profileId = spsParser.readBits(8)
+        spsParser.skipBytes(1) # constraint_set flags and reserved_zero_2bits
         self.levelId = spsParser.readBits(8)
-        spsParser.skipBytes(1)
 
         spsParser.readUnsignedExpGolombCodedInt()
 
@@ -0,0 +1,174 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+from parsers.nalreader import NALUnitReader
+
+class H265Reader(NALUnitReader):
+
+    NAL_HEADER_SIZE = 5
+
+    NAL_UNIT_TYPE_RASL_R = 9
+    NAL_UNIT_TYPE_BLA_W_LP = 16
+    NAL_UNIT_TYPE_IRAP_RESERVED_23 = 23
+    NAL_UNIT_TYPE_VPS = 32
+    NAL_UNIT_TYPE_SPS = 33
+    NAL_UNIT_TYPE_PPS = 34
+    NAL_UNIT_TYPE_AUD = 35
+
+    SLICE_TYPE_B = 0
+    SLICE_TYPE_P = 1
+    SLICE_TYPE_I = 2
+
+    PROFILE_NAMES = {
+        1: "Main",
+        2: "Main 10",
+        3: "Main Still Picture",
+        4: "Range Extensions",
+        5: "High Throughput",
+        9: "Screen Content Coding",
+    }
+
+    # Reader attributes set by a VPS or SPS, as memoized in the ParameterSetCache
+    VPS_FIELDS = ('profileId', 'tierFlag', 'levelId')
+    SPS_FIELDS = VPS_FIELDS + ('chromaFormatIdc', 'frameWidth', 'frameHeight',
+                               'bitDepthLuma', 'bitDepthChroma')
+
+    def __init__(self):
+        NALUnitReader.__init__(self)
+        self.profileId = 0
+        self.tierFlag = 0
+        self.levelId = 0
+        self.frameWidth = 0
+        self.frameHeight = 0
+        self.chromaFormatIdc = 1
+        self.bitDepthLuma = 8
+        self.bitDepthChroma = 8
+        # num_extra_slice_header_bits by pps_pic_parameter_set_id
+        self.ppsExtraSliceHeaderBits = dict()
+
+    def getMimeType(self):
+        return "video/hevc"
+
+    def getFormat(self):
+        return "Video (H.265) - Profile: {}, Tier: {}, Level: {}, Resolution: {}x{}, Bit depth: {}".format(
+            self.PROFILE_NAMES.get(self.profileId, self.profileId),
+            "High" if self.tierFlag else "Main",
+            "{}.{}".format(self.levelId // 30, (self.levelId % 30) // 3),
+            self.frameWidth, self.frameHeight, self.bitDepthLuma)
+
+    def _getNALUnitType(self, start):
+        return (self.dataBuffer[start + 3] >> 1) & 0x3F
+
+    def _processNALUnit(self, start, limit, nalType):
+        if(nalType <= self.NAL_UNIT_TYPE_RASL_R):
+            self._parseSliceNALUnit(start, limit, nalType, False)
+        elif(self.NAL_UNIT_TYPE_BLA_W_LP <= nalType <= self.NAL_UNIT_TYPE_IRAP_RESERVED_23):
+            self._parseSliceNALUnit(start, limit, nalType, True)
+        elif(nalType == self.NAL_UNIT_TYPE_VPS):
+            self._parseVPSNALUnit(start, limit)
+        elif(nalType == self.NAL_UNIT_TYPE_SPS):
+            self._parseSPSNALUnit(start, limit)
+        elif(nalType == self.NAL_UNIT_TYPE_PPS):
+            self._parsePPSNALUnit(start, limit)
+        elif(nalType == self.NAL_UNIT_TYPE_AUD):
+            self._endAccessUnit()
+
+    def _getSliceTypeName(self, sliceType):
+        if(sliceType == self.SLICE_TYPE_B):
+            return "B"
+        elif(sliceType == self.SLICE_TYPE_P):
+            return "P"
+        elif(sliceType == self.SLICE_TYPE_I):
+            return "I"
+        return "Unknown"
+
+    def _parseSliceNALUnit(self, start, limit, nalType, isIRAP):
+        sliceParser = self._getRBSPReader(start, limit, self.SLICE_HEADER_WINDOW)
+        firstSliceSegmentInPic = sliceParser.readBit()
+        if(firstSliceSegmentInPic == 0):
+            # The type of later slice segments is not needed for framing and
+            # would require slice_segment_address, which depends on the SPS
+            self._addSlice(None, isIRAP, False)
+            return
+
+        if(isIRAP):
+            sliceParser.skipBits(1) # no_output_of_prior_pics_flag
+        ppsId = sliceParser.readUnsignedExpGolombCodedInt()
+        sliceParser.skipBits(self.ppsExtraSliceHeaderBits.get(ppsId, 0)) # slice_reserved_flag[]
+        sliceType = sliceParser.readUnsignedExpGolombCodedInt()
+
+        self._addSlice(self._getSliceTypeName(sliceType), isIRAP, True)
+
+    def _parseVPSNALUnit(self, start, limit):
+        self._parseParameterSet(start, limit, self._readVPS, self.VPS_FIELDS)
+
+    def _readVPS(self, start, limit):
+        vpsParser = self._getRBSPReader(start, limit, self.PARAMETER_SET_WINDOW)
+        vpsParser.skipBits(4) # vps_video_parameter_set_id
+        vpsParser.skipBits(2) # vps_base_layer_internal_flag, vps_base_layer_available_flag
+        vpsParser.skipBits(6) # vps_max_layers_minus1
+        maxSubLayersMinus1 = vpsParser.readBits(3)
+        vpsParser.skipBits(1 + 16) # vps_temporal_id_nesting_flag, vps_reserved_0xffff_16bits
+        self._parseProfileTierLevel(vpsParser, maxSubLayersMinus1)
+
+    def _parseSPSNALUnit(self, start, limit):
+        self._activateSPS(self._parseParameterSet(start, limit, self._readSPS, self.SPS_FIELDS))
+
+    def _readSPS(self, start, limit):
+        spsParser = self._getRBSPReader(start, limit, self.PARAMETER_SET_WINDOW)
+        spsParser.skipBits(4) # sps_video_parameter_set_id
+        maxSubLayersMinus1 = spsParser.readBits(3)
+        spsParser.skipBits(1) # sps_temporal_id_nesting_flag
+        self._parseProfileTierLevel(spsParser, maxSubLayersMinus1)
+
+        spsParser.readUnsignedExpGolombCodedInt() # sps_seq_parameter_set_id
+        self.chromaFormatIdc = spsParser.readUnsignedExpGolombCodedInt()
+        if(self.chromaFormatIdc == 3):
+            spsParser.skipBits(1) # separate_colour_plane_flag
+
+        self.frameWidth = spsParser.readUnsignedExpGolombCodedInt()
+        self.frameHeight = spsParser.readUnsignedExpGolombCodedInt()
+
+        conformanceWindowFlag = spsParser.readBit()
+        if(conformanceWindowFlag == 1):
+            confWinLeft = spsParser.readUnsignedExpGolombCodedInt()
+            confWinRight = spsParser.readUnsignedExpGolombCodedInt()
+            confWinTop = spsParser.readUnsignedExpGolombCodedInt()
+            confWinBottom = spsParser.readUnsignedExpGolombCodedInt()
+            subWidthC = 2 if self.chromaFormatIdc in (1, 2) else 1
+            subHeightC = 2 if self.chromaFormatIdc == 1 else 1
+            self.frameWidth -= subWidthC * (confWinLeft + confWinRight)
+            self.frameHeight -= subHeightC * (confWinTop + confWinBottom)
+
+        self.bitDepthLuma = spsParser.readUnsignedExpGolombCodedInt() + 8
+        self.bitDepthChroma = spsParser.readUnsignedExpGolombCodedInt() + 8
+
+    def _parsePPSNALUnit(self, start, limit):
+        ppsParser = self._getRBSPReader(start, limit, self.PARAMETER_SET_WINDOW)
+        ppsId = ppsParser.readUnsignedExpGolombCodedInt()
+        ppsParser.readUnsignedExpGolombCodedInt() # pps_seq_parameter_set_id
+        ppsParser.skipBits(2) # dependent_slice_segments_enabled_flag, output_flag_present_flag
+        self.ppsExtraSliceHeaderBits[ppsId] = ppsParser.readBits(3)
+
+    def _parseProfileTierLevel(self, parser, maxSubLayersMinus1):
+        parser.skipBits(2) # general_profile_space
+        self.tierFlag = parser.readBit()
+        self.profileId = parser.readBits(5)
+        parser.skipBits(32) # general_profile_compatibility_flag[32]
+        parser.skipBits(48) # source/constraint flags and reserved bits
+        self.levelId = parser.readBits(8)
+
+        subLayerProfilePresent = []
+        subLayerLevelPresent = []
+        for _ in range(maxSubLayersMinus1):
+            subLayerProfilePresent.append(parser.readBit())
+            subLayerLevelPresent.append(parser.readBit())
+        if(maxSubLayersMinus1 > 0):
+            parser.skipBits(2 * (8 - maxSubLayersMinus1)) # reserved_zero_2bits
+
+        for i in range(maxSubLayersMinus1):
+            if(subLayerProfilePresent[i]):
+                parser.skipBits(88)
+            if(subLayerLevelPresent[i]):
+                parser.skipBits(8)
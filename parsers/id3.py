@@ -0,0 +1,171 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+ID3_HEADER_SIZE = 10
+ID3_FOOTER_SIZE = 10
+
+ID3_FLAG_UNSYNCHRONISATION = 0x80
+ID3_FLAG_EXTENDED_HEADER = 0x40
+ID3_FLAG_FOOTER = 0x10
+
+# ID3v2.4 frame format flags
+ID3_FRAME_FLAG_UNSYNCHRONISATION = 0x02
+ID3_FRAME_FLAG_DATA_LENGTH = 0x01
+
+# Text encodings used by T*** frames, TXXX and GEOB, with the size of their
+# string terminator
+ID3_ENCODINGS = [("latin-1", 1), ("utf-16", 2), ("utf-16-be", 2), ("utf-8", 1)]
+
+
+def synchsafe(data, offset, size=4):
+    """Integer stored with 7 bits per byte, as used by ID3v2 sizes."""
+    value = 0
+    for i in range(offset, offset + size):
+        value = (value << 7) | (data[i] & 0x7F)
+    return value
+
+
+def resynchronise(data):
+    """Undo ID3v2 unsynchronisation: drop the 0x00 inserted after every 0xFF."""
+    return data.replace(b'\xff\x00', b'\xff')
+
+
+def parseID3Tags(data, pts):
+    """
+    Parse the ID3v2 tags found back to back at the start of `data` (a PES
+    payload) and stamp them with `pts`. Only tag and frame headers are
+    read; frame bodies are decoded on access.
+    """
+    tags = []
+    offset = 0
+    while(len(data) - offset >= ID3_HEADER_SIZE and data[offset:offset + 3] == b'ID3'):
+        flags = data[offset + 5]
+        size = synchsafe(data, offset + 6)
+        end = offset + ID3_HEADER_SIZE + size
+        tags.append(ID3Tag(pts, data[offset + 3], bytes(data[offset + ID3_HEADER_SIZE:end]), flags))
+        offset = end
+        if(flags & ID3_FLAG_FOOTER):
+            offset += ID3_FOOTER_SIZE
+    return tags
+
+
+def _splitString(data, offset, encoding):
+    """Decode a terminated string at `offset`; returns (text, offset after the terminator)."""
+    name, width = ID3_ENCODINGS[encoding] if encoding < len(ID3_ENCODINGS) else ID3_ENCODINGS[0]
+    terminator = b'\x00' * width
+    end = data.find(terminator, offset)
+    while(end != -1 and (end - offset) % width):
+        end = data.find(terminator, end + 1)
+    if(end == -1):
+        end = len(data)
+    return data[offset:end].decode(name, errors="replace"), end + width
+
+
+class ID3Frame(object):
+    """
+    A frame of an ID3v2 tag. `value` decodes the body the first time it is
+    read:
+
+        PRIV         {"owner": str, "data": bytes}
+        TXXX         {"description": str, "value": str}
+        GEOB         {"mime": str, "filename": str, "description": str, "data": bytes}
+        other T***   str
+        anything     the raw body, as bytes
+    """
+
+    def __init__(self, frameId, data, start, end, unsynchronised=False):
+        self.id = frameId
+        self.size = end - start
+        self._data = data
+        self._start = start
+        self._end = end
+        self._unsynchronised = unsynchronised
+        self._value = None
+
+    def getData(self):
+        data = self._data[self._start:self._end]
+        return resynchronise(data) if self._unsynchronised else data
+
+    @property
+    def value(self):
+        if(self._value is None):
+            self._value = self._decode(self.getData())
+        return self._value
+
+    def _decode(self, body):
+        if(self.id == "PRIV"):
+            owner, offset = _splitString(body, 0, 0)
+            return {"owner": owner, "data": body[offset:]}
+        if(not body):
+            return body
+
+        if(self.id == "TXXX"):
+            description, offset = _splitString(body, 1, body[0])
+            value, _ = _splitString(body, offset, body[0])
+            return {"description": description, "value": value}
+        elif(self.id == "GEOB"):
+            mime, offset = _splitString(body, 1, 0)
+            filename, offset = _splitString(body, offset, body[0])
+            description, offset = _splitString(body, offset, body[0])
+            return {"mime": mime, "filename": filename, "description": description, "data": body[offset:]}
+        elif(self.id.startswith("T")):
+            return _splitString(body, 1, body[0])[0]
+        return body
+
+
+class ID3Tag(object):
+    """An ID3v2 tag carried in a timed-metadata PES packet."""
+
+    def __init__(self, pts, version, data, flags=0):
+        # PTS of the PES packet carrying the tag, in 90 kHz ticks
+        self.pts = pts
+        self.version = version
+        self.flags = flags
+        self.data = data
+        self.frames = self._parseFrameHeaders()
+
+    def getFrameIds(self):
+        return [frame.id for frame in self.frames]
+
+    def getFrames(self, frameId):
+        return [frame for frame in self.frames if frame.id == frameId]
+
+    def _parseFrameHeaders(self):
+        data = self.data
+        unsynchronised = bool(self.flags & ID3_FLAG_UNSYNCHRONISATION)
+        # Up to v2.3 unsynchronisation applies to the whole tag; v2.4 applies
+        # it frame by frame, the tag flag meaning every frame has it
+        if(unsynchronised and self.version < 4):
+            data = self.data = resynchronise(data)
+        offset = 0
+        if(self.flags & ID3_FLAG_EXTENDED_HEADER):
+            if(self.version >= 4):
+                offset = synchsafe(data, 0)
+            else:
+                offset = int.from_bytes(data[0:4], "big") + 4
+
+        # ID3v2.2 frame IDs and sizes take 3 bytes each, later versions use 4;
+        # only v2.4 frame sizes are synchsafe
+        idSize = 3 if self.version == 2 else 4
+        headerSize = 6 if self.version == 2 else 10
+
+        frames = []
+        while(len(data) - offset >= headerSize and data[offset] != 0):
+            frameId = data[offset:offset + idSize].decode("latin-1")
+            if(self.version >= 4):
+                size = synchsafe(data, offset + idSize)
+            else:
+                size = int.from_bytes(data[offset + idSize:offset + 2 * idSize], "big")
+            start = offset + headerSize
+            end = min(start + size, len(data))
+            offset = end
+            frameUnsynchronised = False
+            if(self.version >= 4):
+                formatFlags = data[start - 1]
+                frameUnsynchronised = unsynchronised or bool(formatFlags & ID3_FRAME_FLAG_UNSYNCHRONISATION)
+                if(formatFlags & ID3_FRAME_FLAG_DATA_LENGTH):
+                    # Synchsafe size of the frame before unsynchronisation
+                    start = min(start + 4, end)
+            frames.append(ID3Frame(frameId, data, start, end, frameUnsynchronised))
+        return frames
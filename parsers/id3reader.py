@@ -3,13 +3,14 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from bitreader import BitReader
 from parsers.payloadreader import PayloadReader
+from parsers.id3 import parseID3Tags
 
 class ID3Reader(PayloadReader):
 
     def __init__(self):
         PayloadReader.__init__(self)
+        self.tags = []
 
     def getMimeType(self):
         return "application/id3"
@@ -17,9 +18,17 @@ class ID3Reader(PayloadReader):
     def getDuration(self):
         return 0
 
+    def getFirstPTS(self):
+        # None until a tag has been found; there is no PTS to report
+        return self.tags[0].pts if self.tags else None
+
+    def getLastPTS(self):
+        return self.tags[-1].pts if self.tags else None
+
     def getFormat(self):
         return "ID3"
 
-    def consumeData(self, pts):
-        #print "Packet length: {}, type: {}".format(len(self.dataBuffer), self.getMimeType())
-        pass
+    def consumeData(self, pts, dts=-1):
+        # The buffer holds exactly one PES packet, the one `pts` belongs to
+        self.tags.extend(parseID3Tags(self.dataBuffer, pts))
+        self.dataBuffer = bytearray()
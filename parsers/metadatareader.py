@@ -3,23 +3,16 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from bitreader import BitReader
-from parsers.payloadreader import PayloadReader
+from parsers.id3reader import ID3Reader
 
-class MetadataReader(PayloadReader):
-
-    def __init__(self):
-        PayloadReader.__init__(self)
+class MetadataReader(ID3Reader):
+    """
+    PES private data (stream type 0x06). HLS packagers use it to carry ID3
+    timed metadata; payloads that do not start with an ID3 tag are dropped.
+    """
 
     def getMimeType(self):
         return "application/metadata"
 
-    def getDuration(self):
-        return 0
-
     def getFormat(self):
         return "Metadata"
-
-    def consumeData(self, pts):
-        #print "Packet length: {}, type: {}".format(len(self.dataBuffer), self.getMimeType())
-        pass
@@ -3,31 +3,174 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from bitreader import BitReader
 from parsers.payloadreader import PayloadReader
+from parsers.timestamp import TIMESCALE
 
 class MpegReader(PayloadReader):
 
+    MPEG_HEADER_SIZE = 4
+
+    # Indexed by the 2-bit version field (1 is reserved)
+    MPEG_VERSION_NAMES = ["MPEG-2.5", None, "MPEG-2", "MPEG-1"]
+
+    # Indexed by the 2-bit layer field (0 is reserved)
+    MPEG_LAYER_NAMES = [None, "Layer III", "Layer II", "Layer I"]
+
+    # Sample rates in Hz by version field, then sampling_frequency index
+    MPEG_SAMPLE_RATES = [
+        [11025, 12000, 8000],
+        None,
+        [22050, 24000, 16000],
+        [44100, 48000, 32000]]
+
+    # Bitrates in kbps by (MPEG-1, layer field), then bitrate index. Index 0
+    # (free format) and 15 (invalid) cannot be sized and are left out.
+    MPEG_BITRATES = {
+        (True, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        (True, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+        (False, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        (False, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    }
+
+    MPEG_CHANNEL_MODES = ["Stereo", "Joint stereo", "Dual channel", "Mono"]
+
+    # Decoded headers by their second and third bytes, shared by all readers
+    _headerInfo = {}
+
     def __init__(self):
         PayloadReader.__init__(self)
         self.firstTimeStamp = -1
-        self.timeUs = -1
+        self.pts = -1
+        # Timestamps are derived from the last PES PTS plus the samples
+        # decoded since, so they stay exact in 90 kHz ticks
+        self.basePts = -1
+        self.baseSamples = 0
+        # Bytes at the start of the buffer left over from the previous PES
+        # packet: the start of a frame that is timed from the previous PTS
+        self.carried = 0
+        self.version = None
+        self.layer = None
+        self.sampleRate = 0
+        self.bitrate = 0
+        self.channelMode = None
 
     def getMimeType(self):
         return "audio/mpeg"
 
     def getFormat(self):
-        return "MPEG Audio (MP3)"
+        if(self.version is None):
+            return "MPEG Audio (MP3)"
+        return "MPEG Audio ({} {}) - Sample Rate: {}, Bitrate: {} kbps, Channel mode: {}".format(
+            self.version, self.layer, self.sampleRate, self.bitrate, self.channelMode)
 
     def getFirstPTS(self):
         return self.firstTimeStamp
 
     def getLastPTS(self):
-        return self.timeUs
+        return self.pts
 
-    def consumeData(self, pts):
+    def consumeData(self, pts, dts=-1):
         if(self.firstTimeStamp == -1):
             self.firstTimeStamp = pts;
 
-        if(pts != -1):
-            self.timeUs = pts
+        # `pts` belongs to the first frame starting in this PES packet; a
+        # frame carried over from the previous one keeps its extrapolated PTS
+        rebased = (pts == -1)
+
+        # Frame sizes follow from the header, so hop from one frame to the
+        # next and only search for a syncword after corrupt data.
+        data = self.dataBuffer
+        limit = len(data) - self.MPEG_HEADER_SIZE
+        offset = self._findNextSync(0)
+
+        while(offset <= limit):
+            if(not rebased and offset >= self.carried):
+                self._rebase(pts)
+                rebased = True
+            info = None
+            if(data[offset] == 0xFF and (data[offset + 1] & 0xE0) == 0xE0):
+                info = self._parseMpegHeader(data[offset + 1], data[offset + 2])
+            if(info is None):
+                offset = self._findNextSync(offset + 1)
+                continue
+
+            frameSize, samples, version, layer, sampleRate, bitrate = info
+            if(offset + frameSize > len(data)):
+                # Frame continues in the next PES packet
+                break
+
+            if(sampleRate != self.sampleRate):
+                self._rebase(self.pts)
+            self.version = version
+            self.layer = layer
+            self.sampleRate = sampleRate
+            self.bitrate = bitrate
+            self.channelMode = self.MPEG_CHANNEL_MODES[data[offset + 3] >> 6]
+
+            self.frames.add("I", self.pts, True, frameSize)
+            self.baseSamples += samples
+            self.pts = self.basePts + self.baseSamples * TIMESCALE // sampleRate
+            offset += frameSize
+
+        if(not rebased and offset >= self.carried):
+            self._rebase(pts)
+
+        self.dataBuffer = self.dataBuffer[offset:]
+        self.carried = len(self.dataBuffer)
+
+    def _rebase(self, pts):
+        self.pts = pts
+        self.basePts = pts
+        self.baseSamples = 0
+
+    def _findNextSync(self, index):
+        data = self.dataBuffer
+        limit = len(data) - 1
+
+        i = data.find(b'\xff', index, limit)
+        while(i != -1):
+            if((data[i + 1] & 0xE0) == 0xE0):
+                return i
+            i = data.find(b'\xff', i + 1, limit)
+
+        return len(data)
+
+    def _parseMpegHeader(self, b1, b2):
+        """
+        Decode the header bytes following the first sync byte into
+        (frameSize, samples, version, layer, sampleRate, bitrate), or
+        None for reserved, free-format or invalid headers.
+        """
+        key = (b1 << 8) | b2
+        try:
+            return self._headerInfo[key]
+        except KeyError:
+            pass
+
+        info = None
+        versionId = (b1 >> 3) & 0x03
+        layerId = (b1 >> 1) & 0x03
+        bitrateIndex = b2 >> 4
+        sampleRateIndex = (b2 >> 2) & 0x03
+        padding = (b2 >> 1) & 0x01
+
+        if(versionId != 1 and layerId != 0 and 0 < bitrateIndex < 15 and sampleRateIndex < 3):
+            mpeg1 = (versionId == 3)
+            bitrate = self.MPEG_BITRATES[(mpeg1, layerId)][bitrateIndex]
+            sampleRate = self.MPEG_SAMPLE_RATES[versionId][sampleRateIndex]
+
+            if(layerId == 3):
+                samples = 384
+                frameSize = (12 * bitrate * 1000 // sampleRate + padding) * 4
+            else:
+                samples = 576 if (layerId == 1 and not mpeg1) else 1152
+                frameSize = (samples // 8) * bitrate * 1000 // sampleRate + padding
+
+            info = (frameSize, samples,
+                    self.MPEG_VERSION_NAMES[versionId], self.MPEG_LAYER_NAMES[layerId],
+                    sampleRate, bitrate)
+
+        self._headerInfo[key] = info
+        return info
@@ -0,0 +1,195 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import logging
+from bitreader import BitReader
+from parsers.payloadreader import PayloadReader
+
+NAL_START_CODE = b'\x00\x00\x01'
+EMULATION_PREVENTION = b'\x00\x00\x03'
+
+
+def unescapeRBSP(data):
+    """Remove emulation prevention bytes (00 00 03 -> 00 00) from a NAL unit."""
+    return data.replace(EMULATION_PREVENTION, b'\x00\x00')
+
+
+class NALUnitReader(PayloadReader):
+    """
+    Common Annex B handling for H.264 and H.265 elementary streams.
+
+    Start codes are located with bytearray.find, so scanning a PES payload
+    runs in C instead of one Python iteration per byte. Subclasses provide
+    _getNALUnitType() and _processNALUnit().
+
+    Header parsers read from _getRBSPReader(), which copies and unescapes
+    only a bounded window at the start of the NAL unit: slices can be
+    hundreds of KB while their headers fit in a few bytes. Parameter sets go
+    through _parseParameterSet(), which replays the fields of a previously
+    parsed identical NAL unit from the shared ParameterSetCache.
+
+    Slices are grouped into access units, delimited by an AUD, by the first
+    slice of a picture and by the end of the PES packet, and each access
+    unit becomes one Frame.
+    """
+
+    # Start code plus NAL unit header
+    NAL_HEADER_SIZE = 4
+
+    # Bytes of payload copied for slice, SEI and AUD headers, and the upper
+    # bound for parameter sets
+    SLICE_HEADER_WINDOW = 32
+    PARAMETER_SET_WINDOW = 1024
+
+    def __init__(self):
+        PayloadReader.__init__(self)
+        self.firstTimeStamp = -1
+        self.pts = -1
+        # Raw SPS NAL units, in the order they became active
+        self.sequenceParameterSets = []
+        # Access unit being assembled
+        self.auPts = -1
+        self.auDts = -1
+        self.auSlices = 0
+        self.auSliceTypes = []
+        self.auKeyframe = False
+        self.auSize = 0
+        # Bytes of NAL units not yet attributed to an access unit
+        self.auPendingSize = 0
+
+    def getFirstPTS(self):
+        return self.firstTimeStamp
+
+    def getLastPTS(self):
+        return self.pts
+
+    def consumeData(self, pts, dts=-1):
+        if(self.firstTimeStamp == -1):
+            self.firstTimeStamp = pts;
+
+        if(pts != -1):
+            self.pts = pts
+
+        if(len(self.dataBuffer) == 0):
+            return
+
+        # The buffer holds one complete PES packet, so every NAL unit in it,
+        # including the last one, belongs to this PTS
+        self.auPts = self.pts
+        self.auDts = dts if dts != -1 else self.pts
+
+        # Zero bytes before a start code (the leading 00 of a 4-byte start
+        # code, trailing_zero_8bits) belong to the NAL unit that follows them
+        offset = self._findNextNALUnit(0)
+        unitStart = self._trimZeros(0, offset)
+        while (offset < len(self.dataBuffer)):
+            nextNalUnit = self._findNextNALUnit(offset + 3)
+            end = nextNalUnit
+            if(nextNalUnit < len(self.dataBuffer)):
+                end = self._trimZeros(offset + 3, nextNalUnit)
+            self.auPendingSize += end - unitStart
+            try:
+                self._processNALUnit(offset, end, self._getNALUnitType(offset))
+            except IndexError:
+                # Header runs past the end of the NAL unit or window
+                logging.debug("Truncated NAL unit of type %d skipped", self._getNALUnitType(offset))
+            unitStart = end
+            offset = nextNalUnit
+
+        self.dataBuffer = bytearray()
+        self.auSize += self.auPendingSize
+        self.auPendingSize = 0
+        self._endAccessUnit()
+
+    def _addSlice(self, sliceType, keyframe, firstInPicture):
+        """
+        Add a slice to the current access unit, closing the previous one when
+        this is the first slice of a new picture. `sliceType` may be None for
+        slices whose type is not parsed.
+        """
+        if(firstInPicture):
+            self._endAccessUnit()
+        self.auSlices += 1
+        if(sliceType is not None and sliceType not in self.auSliceTypes):
+            self.auSliceTypes.append(sliceType)
+        self.auKeyframe = self.auKeyframe or keyframe
+        # NAL units since the previous slice (SEI, parameter sets, this slice)
+        self.auSize += self.auPendingSize
+        self.auPendingSize = 0
+
+    def _endAccessUnit(self):
+        """Emit the access unit being assembled as one Frame, if it has slices."""
+        if(self.auSlices > 0):
+            self.frames.add(self._getPictureType(self.auSliceTypes), self.auPts,
+                            self.auKeyframe, size=self.auSize,
+                            sliceTypes=tuple(self.auSliceTypes), dts=self.auDts)
+        self.auSlices = 0
+        self.auSliceTypes = []
+        self.auKeyframe = False
+        self.auSize = 0
+
+    def _getPictureType(self, sliceTypes):
+        if("B" in sliceTypes):
+            return "B"
+        elif("P" in sliceTypes or "SP" in sliceTypes):
+            return "P"
+        elif(sliceTypes):
+            return sliceTypes[0]
+        return "Unknown"
+
+    def _findNextNALUnit(self, index):
+        # A start code only counts if at least one byte of NAL header follows
+        limit = len(self.dataBuffer) - 3
+        i = self.dataBuffer.find(NAL_START_CODE, index)
+        if i == -1 or i >= limit:
+            return len(self.dataBuffer)
+        return i
+
+    def _trimZeros(self, start, end):
+        """End of [start, end) once the zero bytes it ends with are dropped."""
+        data = self.dataBuffer
+        while(end > start and data[end - 1] == 0):
+            end -= 1
+        return end
+
+    def _getRBSPReader(self, start, limit, window):
+        """
+        BitReader over the payload of the NAL unit at [start, limit), limited
+        to `window` bytes and with emulation prevention bytes removed.
+        """
+        begin = start + self.NAL_HEADER_SIZE
+        end = min(limit, begin + window)
+        return BitReader(unescapeRBSP(self.dataBuffer[begin:end]))
+
+    def _parseParameterSet(self, start, limit, parse, fields):
+        """
+        Parse the parameter set at [start, limit) with parse(start, limit),
+        which stores its result in the reader attributes named by `fields`.
+        Returns the raw NAL unit.
+        """
+        raw = bytes(self.dataBuffer[start + 3:limit])
+        cache = self.paramSetCache
+        if(cache is None):
+            parse(start, limit)
+            return raw
+
+        key = (self.__class__.__name__, raw)
+        values = cache.get(key)
+        if(values is None):
+            parse(start, limit)
+            cache.put(key, tuple(getattr(self, field) for field in fields))
+        else:
+            for field, value in zip(fields, values):
+                setattr(self, field, value)
+        return raw
+
+    def _activateSPS(self, raw):
+        if(not self.sequenceParameterSets or self.sequenceParameterSets[-1] != raw):
+            self.sequenceParameterSets.append(raw)
+
+    def _getNALUnitType(self, start):
+        raise NotImplementedError( "Should have implemented this" )
+
+    def _processNALUnit(self, start, limit, nalType):
+        raise NotImplementedError( "Should have implemented this" )
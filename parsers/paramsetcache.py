@@ -0,0 +1,50 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import threading
+from cache import LRUCache
+
+class ParameterSetCache(object):
+    """
+    Parsed parameter sets keyed by their raw NAL unit bytes.
+
+    One instance is shared by all the readers of an analyzer: every segment
+    of every variant repeats the same SPS/PPS, so after the first parse each
+    one costs a dict lookup. The cache also remembers the active SPS of each
+    stream so that a mid-stream change can be reported.
+    """
+
+    def __init__(self, max_entries=256, max_streams=4096):
+        self.parsed = LRUCache(max_entries)
+        self.active = LRUCache(max_streams)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.parsed)
+
+    @property
+    def hits(self):
+        return self.parsed.hits
+
+    @property
+    def misses(self):
+        return self.parsed.misses
+
+    def get(self, key):
+        return self.parsed.get(key)
+
+    def put(self, key, values):
+        self.parsed.put(key, values)
+
+    def activate(self, stream, sps):
+        """
+        Record `sps` (raw bytes) as the active SPS of `stream`. Returns the
+        SPS it replaced when they differ, None otherwise.
+        """
+        with self._lock:
+            previous = self.active.get(stream)
+            self.active.put(stream, sps)
+        if(previous is not None and previous != sps):
+            return previous
+        return None
@@ -3,22 +3,26 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
+from parsers.frame import FrameTimeline
+
 class PayloadReader(object):
 
     def __init__(self):
-        self.dataBuffer = [];
+        self.dataBuffer = bytearray()
         self.framesInfo = ""
-        self.frames = []
-        
+        self.frames = FrameTimeline()
+        # ParameterSetCache shared by the readers of a run, set by PESReader
+        self.paramSetCache = None
+
     def append(self, packet):
         self.dataBuffer.extend(packet.data[packet.byteOffset:])
 
     def flush(self):
         if(len(self.dataBuffer) > 0):
             self.consumeData(-1)
-            self.dataBuffer = []
+            self.dataBuffer = bytearray()
 
-    def consumeData(self, pts):
+    def consumeData(self, pts, dts=-1):
         raise NotImplementedError( "Should have implemented this" )
 
     def getMimeType(self):
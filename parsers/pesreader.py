@@ -3,77 +3,85 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-from parsers.h264reader import H264Reader
-from parsers.adtsreader import ADTSReader
-from parsers.id3reader import ID3Reader
-from parsers.mpegreader import MpegReader
-from parsers.metadatareader import MetadataReader
-from parsers.unknownpayloadreader import UnknownPayloadReader
+import importlib
 from bitreader import BitReader
+from parsers.timestamp import TimestampUnwrapper
 
 class PESReader(object):
 
     TS_STREAM_TYPE_AAC = 0x0F
     TS_STREAM_TYPE_H264 = 0x1B
+    TS_STREAM_TYPE_H265 = 0x24
     TS_STREAM_TYPE_ID3 = 0x15
     TS_STREAM_TYPE_MPA = 0x03
     TS_STREAM_TYPE_MPA_LSF = 0x04
     TS_STREAM_TYPE_METADATA = 0x06
 
-    def __init__(self, pid, ts_type ):
+    # Payload readers by stream type, as (module, class). Modules are only
+    # imported the first time a stream of that type shows up in a PMT.
+    PAYLOAD_READERS = {
+        TS_STREAM_TYPE_AAC: ('parsers.adtsreader', 'ADTSReader'),
+        TS_STREAM_TYPE_H264: ('parsers.h264reader', 'H264Reader'),
+        TS_STREAM_TYPE_H265: ('parsers.h265reader', 'H265Reader'),
+        TS_STREAM_TYPE_ID3: ('parsers.id3reader', 'ID3Reader'),
+        TS_STREAM_TYPE_MPA: ('parsers.mpegreader', 'MpegReader'),
+        TS_STREAM_TYPE_MPA_LSF: ('parsers.mpegreader', 'MpegReader'),
+        TS_STREAM_TYPE_METADATA: ('parsers.metadatareader', 'MetadataReader'),
+    }
+    UNKNOWN_PAYLOAD_READER = ('parsers.unknownpayloadreader', 'UnknownPayloadReader')
+
+    def __init__(self, pid, ts_type, paramSetCache=None, unwrapper=None):
         self.pid = pid
+        # 33-bit PTS/DTS become int64 90 kHz ticks on the unwrapper's timeline
+        self.unwrapper = unwrapper if unwrapper is not None else TimestampUnwrapper()
         self.type = ts_type
         self.lastPts = -1;
+        self.lastDts = -1
         self.pesLength = 0;
+        self.payloadReader = self._createPayloadReader(ts_type)
+        self.payloadReader.paramSetCache = paramSetCache
 
-        if (ts_type == self.TS_STREAM_TYPE_AAC):
-            self.payloadReader = ADTSReader()
-        elif (ts_type == self.TS_STREAM_TYPE_H264):
-            self.payloadReader = H264Reader()
-        elif (ts_type == self.TS_STREAM_TYPE_ID3):
-            self.payloadReader = ID3Reader()
-        elif (ts_type == self.TS_STREAM_TYPE_MPA or ts_type == self.TS_STREAM_TYPE_MPA_LSF):
-            self.payloadReader = MpegReader()
-        elif (ts_type == self.TS_STREAM_TYPE_METADATA):
-            self.payloadReader = MetadataReader()    
-        else:
-            self.payloadReader = UnknownPayloadReader()
+    def _createPayloadReader(self, ts_type):
+        moduleName, className = self.PAYLOAD_READERS.get(ts_type, self.UNKNOWN_PAYLOAD_READER)
+        return getattr(importlib.import_module(moduleName), className)()
 
     def appendData(self, payload_unit_start_indicator, packet):
         if(payload_unit_start_indicator):
             if(self.payloadReader is not None):
-                self.payloadReader.consumeData(self.lastPts)
+                self.payloadReader.consumeData(self.lastPts, self.lastDts)
             self._parsePESHeader(packet)
 
         if(self.payloadReader is not None):
             self.payloadReader.append(packet)
 
+    def flush(self):
+        """Hand the PES packet still being buffered over to the payload reader."""
+        if(self.payloadReader is not None):
+            self.payloadReader.consumeData(self.lastPts, self.lastDts)
+
     def _parsePESHeader(self, packet):
         packet.skipBytes(7)
         timingFlags = (packet.readUnsignedByte() & 0xc0) >> 6
 
         pesLength = packet.readUnsignedByte()
+        payloadOffset = packet.byteOffset + pesLength
 
         if (timingFlags == 0x02 or timingFlags == 0x03):
-             packet.skipBits(4); # '0010'
-             pts = packet.readBitsLong(3) << 30;
-             packet.skipBits(1); # marker_bit
-             pts |= packet.readBitsLong(15) << 15;
-             packet.skipBits(1); # marker_bit
-             pts |= packet.readBitsLong(15);
-             packet.skipBits(1); # marker_bit
-
-             self.lastPts = self._ptsToTimeUs(pts);
-
+             self.lastPts = self.unwrapper.unwrap(self._readTimestamp(packet))
              if (timingFlags == 0x03):
-                 packet.skipBytes(5) # skipping dts
-
-    def _ptsToTimeUs(self, pts):
-        if (pts > 4294967295):
-            # decrement 2^33
-            pts -= 8589934592;
-
-
-        timeUs = pts * 1000000 / 90000
-
-        return timeUs
+                 self.lastDts = self.unwrapper.unwrap(self._readTimestamp(packet))
+             else:
+                 self.lastDts = self.lastPts
+
+        # Skip the remaining optional fields and stuffing bytes
+        packet.byteOffset = payloadOffset
+
+    def _readTimestamp(self, packet):
+        packet.skipBits(4); # '0010' or '0011'
+        ts = packet.readBitsLong(3) << 30;
+        packet.skipBits(1); # marker_bit
+        ts |= packet.readBitsLong(15) << 15;
+        packet.skipBits(1); # marker_bit
+        ts |= packet.readBitsLong(15);
+        packet.skipBits(1); # marker_bit
+        return ts
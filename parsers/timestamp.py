@@ -0,0 +1,40 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+# MPEG-TS timestamps count a 90 kHz clock in 33 bits
+TIMESCALE = 90000
+TIMESTAMP_WRAP = 1 << 33
+
+def ticksToSeconds(ticks):
+    return ticks / float(TIMESCALE)
+
+def secondsToTicks(seconds):
+    return int(round(seconds * TIMESCALE))
+
+
+class TimestampUnwrapper(object):
+    """
+    Maps 33-bit PTS/DTS values onto one monotonic int64 timeline.
+
+    A jump of more than half the 33-bit range from the previous value is
+    taken as a wrap (forwards, or backwards for a B frame presented just
+    before a wrap its DTS already crossed). Sharing one instance across the
+    segments of a variant keeps the timeline continuous through a wrap.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.last = None
+
+    def unwrap(self, timestamp):
+        timestamp += self.offset
+        if(self.last is not None):
+            if(timestamp < self.last - TIMESTAMP_WRAP // 2):
+                self.offset += TIMESTAMP_WRAP
+                timestamp += TIMESTAMP_WRAP
+            elif(timestamp > self.last + TIMESTAMP_WRAP // 2):
+                # Value from before a wrap: do not move the offset back
+                return timestamp - TIMESTAMP_WRAP
+        self.last = timestamp
+        return timestamp
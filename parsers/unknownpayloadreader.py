@@ -20,6 +20,5 @@ class UnknownPayloadReader(PayloadReader):
     def getFormat(self):
         return "Unknown"
 
-    def consumeData(self, pts):
-        #print "Packet length: {}, type: {}".format(len(self.dataBuffer), self.getMimeType())
-        pass
+    def consumeData(self, pts, dts=-1):
+        self.dataBuffer = bytearray()
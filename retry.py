@@ -0,0 +1,130 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Statuses worth retrying; any other error status (404, 403, 410, ...) is final
+RETRYABLE_STATUSES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+# Statuses showing a host (or the origin behind it) is down; a 500 or 501
+# is an answer from a working server
+HOST_DOWN_STATUSES = frozenset([502, 503, 504])
+
+
+class RetryPolicy(object):
+    """
+    How failed downloads are retried: up to `attempts` tries, retrying only
+    connection errors, timeouts and RETRYABLE_STATUSES. The wait before
+    retry n (from 0) is drawn uniformly from [0, min(max_delay,
+    base_delay * 2**n)] ("full jitter"), so clients that failed together do
+    not retry together. A Retry-After header sets the wait instead, still
+    capped at `max_delay`.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=30.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, status):
+        return status in RETRYABLE_STATUSES
+
+    def delay(self, attempt, retry_after=None, base_delay=None):
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_delay)
+        base = self.base_delay if base_delay is None else base_delay
+        return random.uniform(0, min(self.max_delay, base * (2 ** attempt)))
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait according to a Retry-After header (delay-seconds or HTTP-date), None if absent or invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - (time.time() if now is None else now))
+
+
+class CircuitOpenError(IOError):
+    """A request was refused without being sent because its host's circuit is open."""
+
+    def __init__(self, host, retry_in):
+        IOError.__init__(self, "Host {} is failing; requests refused for another {:.0f} s".format(host, retry_in))
+        self.host = host
+        self.retry_in = retry_in
+
+
+class HostCircuit(object):
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0.0
+        self.trial = False
+
+
+class CircuitBreaker(object):
+    """
+    Per-host circuit breaker. After `failure_threshold` consecutive failures
+    (connection errors, timeouts or HOST_DOWN_STATUSES) a host's circuit opens
+    and requests to it fail at once with CircuitOpenError. After
+    `reset_timeout` seconds one trial request is let through (half-open): a
+    success closes the circuit, a failure opens it again. Any other
+    response, a 404 or a 501 included, shows the host is up and resets the
+    count.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host):
+        """Raise CircuitOpenError unless a request to `host` may be sent now."""
+        with self._lock:
+            circuit = self.hosts.get(host)
+            if circuit is None or circuit.state == HostCircuit.CLOSED:
+                return
+            waited = time.monotonic() - circuit.opened
+            if circuit.state == HostCircuit.OPEN and waited >= self.reset_timeout:
+                circuit.state = HostCircuit.HALF_OPEN
+                circuit.trial = False
+            if circuit.state == HostCircuit.HALF_OPEN and not circuit.trial:
+                circuit.trial = True
+                return
+            raise CircuitOpenError(host, max(0.0, self.reset_timeout - waited))
+
+    def record(self, host, failed):
+        with self._lock:
+            circuit = self.hosts.get(host)
+            if circuit is None:
+                if not failed:
+                    return
+                circuit = self.hosts[host] = HostCircuit()
+            if not failed:
+                circuit.state = HostCircuit.CLOSED
+                circuit.failures = 0
+                return
+            circuit.failures += 1
+            if circuit.state == HostCircuit.HALF_OPEN or circuit.failures >= self.failure_threshold:
+                circuit.state = HostCircuit.OPEN
+                circuit.opened = time.monotonic()
+
+    def states(self):
+        """{host: circuit state} of the hosts that have failed."""
+        with self._lock:
+            return {host: circuit.state for host, circuit in self.hosts.items()}
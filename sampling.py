@@ -0,0 +1,106 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import random
+
+SAMPLING_MODES = ('first', 'stride', 'random', 'stratified')
+
+
+class SegmentSampler(object):
+    """
+    Chooses which segments of a media playlist get analyzed.
+
+        first       the first `count` segments
+        stride      every `stride`-th segment, at most `count` of them; by
+                    default the stride spreads `count` segments over the
+                    whole playlist
+        random      `count` segments drawn uniformly, reproducible with `seed`
+        stratified  `count` segments spread over the discontinuity blocks in
+                    proportion to their length (at least one per block when
+                    `count` allows), drawn at random within each block
+
+    With `shared` set, the indexes chosen for the first variant of an
+    analysis are reused for every other variant (see select_shared), so the
+    cross-variant alignment check compares the same segments.
+    """
+
+    def __init__(self, mode='first', stride=None, seed=None, shared=True):
+        if mode not in SAMPLING_MODES:
+            raise ValueError("Unknown sampling mode {!r}, expected one of {}".format(mode, ", ".join(SAMPLING_MODES)))
+        if stride is not None and stride < 1:
+            raise ValueError("Sampling stride must be at least 1")
+        self.mode = mode
+        self.stride = stride
+        self.seed = seed
+        self.shared = shared
+
+    def select(self, segments, count):
+        """Sorted indexes of the segments (m3u8 SegmentList) to analyze."""
+        total = len(segments)
+        count = max(0, min(count, total))
+        if count == 0:
+            return []
+
+        if self.mode == 'first':
+            return list(range(count))
+        if self.mode == 'stride':
+            stride = self.stride or -(-total // count)
+            return list(range(0, total, stride))[:count]
+
+        rng = random.Random(self.seed)
+        if self.mode == 'random':
+            return sorted(rng.sample(range(total), count))
+
+        indexes = []
+        for (start, end), quota in zip(*_allocate(_discontinuity_blocks(segments), count)):
+            indexes.extend(rng.sample(range(start, end), quota))
+        return sorted(indexes)
+
+    def select_shared(self, segments, count, previous):
+        """
+        Like select(), but when sharing and `previous` (the indexes chosen for
+        an earlier variant) is not None, returns those that exist in this
+        playlist instead.
+        """
+        if self.shared and previous is not None:
+            return [index for index in previous if index < len(segments)]
+        return self.select(segments, count)
+
+
+def _discontinuity_blocks(segments):
+    """(start, end) index ranges of the runs of segments between discontinuities."""
+    blocks = []
+    start = 0
+    for i, segment in enumerate(segments):
+        if i > start and segment.discontinuity:
+            blocks.append((start, i))
+            start = i
+    blocks.append((start, len(segments)))
+    return blocks
+
+
+def _allocate(blocks, count):
+    """Split `count` samples over `blocks` in proportion to their length (largest remainder)."""
+    sizes = [end - start for start, end in blocks]
+    if count >= len(blocks):
+        quotas = [1] * len(blocks)
+        remaining = count - len(blocks)
+        weights = [size - 1 for size in sizes]
+    else:
+        quotas = [0] * len(blocks)
+        remaining = count
+        weights = sizes
+    weight_total = sum(weights)
+    if remaining and weight_total:
+        shares = [remaining * weight / float(weight_total) for weight in weights]
+        quotas = [quota + int(share) for quota, share in zip(quotas, shares)]
+        left = count - sum(quotas)
+        order = sorted(range(len(blocks)), key=lambda i: (int(shares[i]) - shares[i], i))
+        for i in order:
+            if left == 0:
+                break
+            if quotas[i] < sizes[i]:
+                quotas[i] += 1
+                left -= 1
+    return blocks, [min(quota, size) for quota, size in zip(quotas, sizes)]
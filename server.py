@@ -0,0 +1,221 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Job(object):
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, url, segments=None, quick=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.segments = segments
+        self.quick = quick
+        self.status = self.QUEUED
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'segments': self.segments,
+            'quick': self.quick,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'result': self.result,
+        }
+
+
+class AnalysisService(object):
+    """
+    Job queue in front of one long-lived HLSAnalyzer.
+
+    Jobs run on a fixed worker pool; the analyzer's fetcher, playlist cache,
+    parameter set cache and segment cache stay warm between jobs. Finished jobs are kept until
+    `max_history` newer ones have completed.
+    """
+
+    def __init__(self, analyzer, workers=4, max_history=1000):
+        self.analyzer = analyzer
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.max_history = max_history
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, url, segments=None, quick=None):
+        job = Job(url, segments, quick)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._trim()
+        self.pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        stats = {'jobs': counts}
+        for name in ('segment_cache', 'playlist_cache', 'parameter_sets'):
+            cache = getattr(self.analyzer, name, None)
+            if cache is not None:
+                stats[name] = {'entries': len(cache), 'hits': cache.hits, 'misses': cache.misses}
+        concurrency = getattr(self.analyzer.fetcher, 'concurrency', None)
+        if concurrency is not None:
+            stats['host_concurrency'] = concurrency.limits()
+        validated = getattr(self.analyzer.fetcher, 'validated', None)
+        if validated is not None:
+            stats['validated_playlists'] = {'entries': len(validated), 'hits': validated.hits,
+                                            'misses': validated.misses}
+        breaker = getattr(self.analyzer.fetcher, 'breaker', None)
+        if breaker is not None:
+            stats['host_circuits'] = breaker.states()
+        return stats
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+    def _run(self, job):
+        job.status = Job.RUNNING
+        job.started = time.time()
+        try:
+            result = self.analyzer.analyze(job.url, segments=job.segments, quick=job.quick)
+            job.result = result.to_dict()
+            job.status = Job.DONE if result.ok else Job.FAILED
+        except Exception as e:
+            logging.error("Job %s failed: %s", job.id, e, exc_info=True)
+            job.result = {'url': job.url, 'ok': False, 'error': str(e)}
+            job.status = Job.FAILED
+        job.finished = time.time()
+        job.done.set()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self.jobs[job_id]
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs            {"url": ..., "segments": 2, "quick": true, "wait": false}
+    GET  /jobs/<id>       job status, with the result once finished
+    GET  /health          queue and cache statistics
+    """
+
+    server_version = "hls-analyzer"
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/health':
+            self._send(200, service.stats())
+        elif self.path.startswith('/jobs/'):
+            job = service.get(self.path[len('/jobs/'):])
+            if job is None:
+                self._send(404, {'error': 'unknown job'})
+            else:
+                self._send(200, job.to_dict())
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            self._send(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            url = body['url']
+            segments = body.get('segments')
+            if segments is not None:
+                segments = int(segments)
+            quick = body.get('quick')
+            if quick is not None:
+                quick = bool(quick)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error': 'invalid job: {}'.format(e)})
+            return
+
+        job = self.server.service.submit(url, segments, quick)
+        if body.get('wait'):
+            job.done.wait()
+            self._send(200, job.to_dict())
+        else:
+            self._send(202, job.to_dict())
+
+    def address_string(self):
+        # Unix sockets report an empty client address
+        return self.client_address[0] or 'unix'
+
+    def log_message(self, format, *args):
+        logging.debug("%s - " + format, self.address_string(), *args)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('', 0)
+
+
+def create_server(service, address):
+    """
+    Bind an HTTP server for `service`. `address` is either "host:port" or
+    "unix:/path/to/socket".
+    """
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = UnixHTTPServer(path, AnalysisRequestHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), AnalysisRequestHandler)
+    server.service = service
+    return server
+
+
+def serve(service, address):
+    server = create_server(service, address)
+    logging.info("Analysis server listening on %s", address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
@@ -0,0 +1,159 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from parsers.timestamp import TIMESTAMP_WRAP, ticksToSeconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    stream TEXT NOT NULL,
+    variant INTEGER,
+    segment_index INTEGER,
+    uri TEXT NOT NULL,
+    byterange TEXT NOT NULL DEFAULT '',
+    etag TEXT,
+    content_hash TEXT NOT NULL,
+    analyzed REAL NOT NULL,
+    frames INTEGER,
+    keyframes INTEGER,
+    min_kfi REAL,
+    max_kfi REAL,
+    first_keyframe INTEGER,
+    last_keyframe INTEGER,
+    mux_rate INTEGER,
+    summary TEXT,
+    warnings TEXT NOT NULL DEFAULT '[]',
+    UNIQUE (uri, byterange, content_hash)
+);
+CREATE INDEX IF NOT EXISTS segments_uri ON segments (uri, byterange, analyzed);
+CREATE INDEX IF NOT EXISTS segments_stream ON segments (stream, analyzed);
+CREATE INDEX IF NOT EXISTS segments_variant ON segments (stream, variant, analyzed);
+CREATE INDEX IF NOT EXISTS segments_time ON segments (analyzed, max_kfi);
+"""
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class StoredSegment(object):
+    """
+    Stored analysis of one segment: the keys it was stored under, when it
+    was analyzed, the video summary of the segment (the
+    VideoFrameInfo.to_state() of that segment alone, None without video)
+    and the warnings the analysis issued.
+    """
+
+    def __init__(self, etag, content_hash, analyzed, summary, warnings):
+        self.etag = etag
+        self.content_hash = content_hash
+        self.analyzed = analyzed
+        self.summary = summary
+        self.warnings = warnings
+
+
+class ResultStore(object):
+    """
+    SQLite store of per-segment analysis results, keyed by segment URI (and
+    byte range) plus content hash, with the ETag kept alongside when the
+    server sent one. Several runs and threads can share one store. Each
+    version of a segment gets its own row, so the table keeps the history
+    of everything analyzed. Times are Unix timestamps, KFIs are seconds,
+    keyframe PTS are 90 kHz ticks.
+
+    The KFIs of a row cover the intervals within the segment and, when the
+    segment before it in the playlist is in the store, the interval from
+    that segment's last keyframe to this segment's first one. With one
+    keyframe per segment that boundary interval is the only one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def lookup(self, uri, byterange=None):
+        """Latest StoredSegment for `uri` and `byterange`, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, content_hash, analyzed, summary, warnings FROM segments "
+                "WHERE uri = ? AND byterange = ? ORDER BY analyzed DESC LIMIT 1",
+                (uri, byterange or '')).fetchone()
+        if row is None:
+            return None
+        etag, digest, analyzed, summary, warnings = row
+        return StoredSegment(etag, digest, analyzed, json.loads(summary) if summary else None, json.loads(warnings))
+
+    def save(self, stream, variant, segment_index, uri, byterange, etag, digest, summary=None, warnings=(),
+             analyzed=None, previous=None):
+        """
+        Store the analysis of a segment. `summary` is the
+        videoframesinfo.VideoFrameInfo of that segment alone, or None.
+        `previous` is the (uri, byterange) of the segment before it in the
+        playlist, whose last stored keyframe gives the interval across the
+        boundary.
+        """
+        values = {
+            'stream': stream,
+            'variant': variant,
+            'segment_index': segment_index,
+            'uri': uri,
+            'byterange': byterange or '',
+            'etag': etag,
+            'content_hash': digest,
+            'analyzed': time.time() if analyzed is None else analyzed,
+            'warnings': json.dumps(list(warnings)),
+        }
+        intervals = []
+        if summary is not None:
+            stats = summary.keyframeStats
+            intervals = list(stats.intervals)
+            values.update({
+                'frames': stats.frames,
+                'keyframes': stats.count,
+                'first_keyframe': stats.positions[0] if stats.positions else None,
+                'last_keyframe': stats.positions[-1] if stats.positions else None,
+                'mux_rate': next(iter(summary.segmentsMuxRate.values()), None),
+                'summary': json.dumps(summary.to_state()),
+            })
+        with self._lock, self._db:
+            if previous is not None and values.get('first_keyframe') is not None:
+                row = self._db.execute(
+                    "SELECT last_keyframe FROM segments WHERE uri = ? AND byterange = ? "
+                    "AND last_keyframe IS NOT NULL ORDER BY analyzed DESC LIMIT 1",
+                    (previous[0], previous[1] or '')).fetchone()
+                if row is not None:
+                    # Keyframe PTS of different runs may be unwrapped differently
+                    intervals.append((values['first_keyframe'] - row[0]) % TIMESTAMP_WRAP)
+            if intervals:
+                values['min_kfi'] = ticksToSeconds(min(intervals))
+                values['max_kfi'] = ticksToSeconds(max(intervals))
+            columns = ", ".join(values)
+            placeholders = ", ".join("?" * len(values))
+            self._db.execute("INSERT OR REPLACE INTO segments ({}) VALUES ({})".format(columns, placeholders),
+                             tuple(values.values()))
+
+    def streams_with_kfi_above(self, seconds, since=None):
+        """
+        (stream, variant, largest KFI, segments over the limit) for every
+        variant with a keyframe interval above `seconds` in a segment
+        analyzed at or after `since` (a Unix timestamp), worst first.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT stream, variant, MAX(max_kfi), COUNT(*) FROM segments "
+                "WHERE analyzed >= ? AND max_kfi > ? GROUP BY stream, variant ORDER BY 3 DESC",
+                (since or 0, seconds)).fetchall()
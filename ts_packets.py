@@ -0,0 +1,252 @@
+# coding: utf-8
+# Use of this source code is governed by a MIT License
+# license that can be found in the LICENSE file.
+
+from array import array
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+TS_NULL_PID = 0x1FFF
+
+# Errors kept with their packet index; counters keep counting past this
+MAX_REPORTED_ERRORS = 50
+
+# PCR runs at 27 MHz; its 33-bit base counts the 90 kHz PTS clock
+PCR_CLOCK = 27000000
+PCR_BASE_WRAP = (1 << 33) * 300
+
+# ISO/IEC 13818-1 requires a PCR at least every 100 ms
+MAX_PCR_INTERVAL = PCR_CLOCK // 10
+
+
+class TSPacketHeaders(object):
+    """
+    Header fields of every packet of a segment, as columns.
+
+    Each column is one strided slice of the segment (`data[n::188]`), so
+    building them costs a handful of C-level copies however many packets
+    there are; no per-packet BitReader or slice is created.
+    """
+
+    def __init__(self, data, offset=0):
+        count = (len(data) - offset) // TS_PACKET_SIZE
+        end = offset + count * TS_PACKET_SIZE
+        self.data = data
+        self.count = count
+        self.offset = offset
+        self.sync = data[offset:end:TS_PACKET_SIZE]
+        # TEI, PUSI, priority, PID high bits
+        self.byte1 = data[offset + 1:end:TS_PACKET_SIZE]
+        # PID low bits
+        self.byte2 = data[offset + 2:end:TS_PACKET_SIZE]
+        # scrambling control, adaptation_field_control, continuity_counter
+        self.byte3 = data[offset + 3:end:TS_PACKET_SIZE]
+        # adaptation_field_length and adaptation field flags (discontinuity,
+        # random access, priority, PCR, ...)
+        self.afLength = data[offset + 4:end:TS_PACKET_SIZE]
+        self.afFlags = data[offset + 5:end:TS_PACKET_SIZE]
+
+
+class PacketIntegrity(object):
+    """Packet level errors found in one segment."""
+
+    def __init__(self):
+        self.packets = 0
+        self.syncErrors = 0
+        self.teiPackets = 0
+        # Per PID counters
+        self.ccErrors = {}
+        self.duplicates = {}
+        self.discontinuities = {}
+        # (packet index, pid, description) of the first errors found
+        self.errors = []
+
+    def hasErrors(self):
+        return bool(self.syncErrors or self.teiPackets or self.ccErrors or self.duplicates)
+
+    def getCCErrorCount(self):
+        return sum(self.ccErrors.values())
+
+    def getDuplicateCount(self):
+        return sum(self.duplicates.values())
+
+    def _addError(self, counters, index, pid, description):
+        if(counters is not None):
+            counters[pid] = counters.get(pid, 0) + 1
+        if(len(self.errors) < MAX_REPORTED_ERRORS):
+            self.errors.append((index, pid, description))
+
+
+class PCRTiming(object):
+    """
+    PCRs and random access points found in one segment.
+
+    Rates and jitter are computed over the PCRs of the PCR PID (the PID
+    carrying the most PCRs) since its last discontinuity_indicator.
+    """
+
+    def __init__(self):
+        self.pcrPid = -1
+        # PCR values (27 MHz, unwrapped) and the index of the packet carrying each
+        self.pcrs = array('q')
+        self.pcrPackets = array('q')
+        # (packet index, pid) of packets with random_access_indicator set
+        self.randomAccess = []
+        self._runs = {}
+
+    def getPCRCount(self):
+        return len(self.pcrs)
+
+    def getMuxRate(self):
+        """Transport rate in bits per second, from the bytes sent between the first and last PCR."""
+        if(len(self.pcrs) < 2 or self.pcrs[-1] == self.pcrs[0]):
+            return 0
+        bits = (self.pcrPackets[-1] - self.pcrPackets[0]) * TS_PACKET_SIZE * 8
+        return bits * PCR_CLOCK // (self.pcrs[-1] - self.pcrs[0])
+
+    def getJitter(self):
+        """
+        Largest deviation, in 27 MHz ticks, of a PCR from the value a
+        constant mux rate between the first and last PCR would give it.
+        """
+        if(len(self.pcrs) < 3):
+            return 0
+        firstPcr, firstPacket = self.pcrs[0], self.pcrPackets[0]
+        span = self.pcrs[-1] - firstPcr
+        packets = self.pcrPackets[-1] - firstPacket
+        if(packets == 0):
+            return 0
+        return max(abs(pcr - firstPcr - (index - firstPacket) * span // packets)
+                   for pcr, index in zip(self.pcrs, self.pcrPackets))
+
+    def getMaxInterval(self):
+        """Longest gap between consecutive PCRs, in 27 MHz ticks."""
+        if(len(self.pcrs) < 2):
+            return 0
+        return max(b - a for a, b in zip(self.pcrs, self.pcrs[1:]))
+
+    def getPTSOffset(self, pts):
+        """
+        Distance in 90 kHz ticks from the first PCR to `pts`, a PTS on the
+        same 33-bit clock (unwrapped or not); None without PCRs.
+        """
+        if(not self.pcrs):
+            return None
+        offset = (pts - self.pcrs[0] // 300) % (1 << 33)
+        if(offset >= (1 << 32)):
+            offset -= (1 << 33)
+        return offset
+
+    def _addPCR(self, index, pid, pcr, discontinuity):
+        run = self._runs.get(pid)
+        if(run is None or discontinuity):
+            run = self._runs[pid] = (array('q'), array('q'))
+        pcrs, packets = run
+        if(pcrs):
+            # Unwrap the 33-bit base within the segment
+            pcr += (pcrs[-1] - pcr + PCR_BASE_WRAP // 2) // PCR_BASE_WRAP * PCR_BASE_WRAP
+        pcrs.append(pcr)
+        packets.append(index)
+
+    def _finish(self):
+        if(self._runs):
+            self.pcrPid = max(self._runs, key=lambda pid: len(self._runs[pid][0]))
+            self.pcrs, self.pcrPackets = self._runs[self.pcrPid]
+        self._runs = {}
+
+
+class PacketScan(object):
+    """Result of scanPackets(): `integrity` (PacketIntegrity) and `timing` (PCRTiming)."""
+
+    def __init__(self):
+        self.integrity = PacketIntegrity()
+        self.timing = PCRTiming()
+
+
+def _readPCR(data, start):
+    base = ((data[start] << 25) | (data[start + 1] << 17) | (data[start + 2] << 9) |
+            (data[start + 3] << 1) | (data[start + 4] >> 7))
+    extension = ((data[start + 4] & 0x01) << 8) | data[start + 5]
+    return base * 300 + extension
+
+
+def scanPackets(headers):
+    """
+    One pass over the packets in `headers` (TSPacketHeaders) checking
+    continuity counters, transport_error_indicator and sync bytes, and
+    collecting PCRs and random access points from the adaptation fields.
+
+    The counter of a PID must advance by one on each packet carrying
+    payload and stay put on adaptation-only packets. One repeat of the
+    previous counter is a duplicate packet; any other jump is a CC error
+    unless the adaptation field sets discontinuity_indicator. Null packets
+    are ignored.
+    """
+    scan = PacketScan()
+    result = scan.integrity
+    timing = scan.timing
+    result.packets = headers.count
+    data = headers.data
+    lastCC = {}
+    duplicated = set()
+
+    for index, (sync, b1, b2, b3, afLength, afFlags) in enumerate(zip(
+            headers.sync, headers.byte1, headers.byte2, headers.byte3,
+            headers.afLength, headers.afFlags)):
+        pid = ((b1 & 0x1F) << 8) | b2
+        if(sync != TS_SYNC_BYTE):
+            result.syncErrors += 1
+            result._addError(None, index, pid, "sync byte 0x{:02x}".format(sync))
+            continue
+        if(b1 & 0x80):
+            result.teiPackets += 1
+            result._addError(None, index, pid, "transport_error_indicator set")
+            # Header may be corrupt: restart counter tracking for this PID
+            lastCC.pop(pid, None)
+            continue
+
+        if(pid == TS_NULL_PID):
+            continue
+
+        discontinuity = False
+        if(b3 & 0x20 and afLength > 0):
+            discontinuity = afFlags & 0x80
+            if(afFlags & 0x40):
+                timing.randomAccess.append((index, pid))
+            if(afFlags & 0x10 and afLength >= 7):
+                start = headers.offset + index * TS_PACKET_SIZE + 6
+                timing._addPCR(index, pid, _readPCR(data, start), discontinuity)
+
+        cc = b3 & 0x0F
+        hasPayload = b3 & 0x10
+        previous = lastCC.get(pid)
+        lastCC[pid] = cc
+        if(previous is None):
+            continue
+
+        if(discontinuity):
+            result.discontinuities[pid] = result.discontinuities.get(pid, 0) + 1
+            continue
+
+        if(not hasPayload):
+            if(cc != previous):
+                result._addError(result.ccErrors, index, pid,
+                                 "CC {} on adaptation-only packet, expected {}".format(cc, previous))
+            continue
+
+        if(cc == previous):
+            if(pid in duplicated):
+                result._addError(result.ccErrors, index, pid, "CC {} repeated more than once".format(cc))
+            else:
+                duplicated.add(pid)
+                result._addError(result.duplicates, index, pid, "duplicate packet (CC {})".format(cc))
+            continue
+
+        duplicated.discard(pid)
+        expected = (previous + 1) & 0x0F
+        if(cc != expected):
+            result._addError(result.ccErrors, index, pid,
+                             "CC {} expected {} ({} packets lost)".format(cc, expected, (cc - expected) & 0x0F))
+
+    timing._finish()
+    return scan
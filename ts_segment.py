@@ -6,6 +6,8 @@
 from array import array
 from bitreader import BitReader
 from parsers.pesreader import PESReader
+from parsers.timestamp import TimestampUnwrapper
+from ts_packets import TSPacketHeaders, scanPackets
 
 class TSSegmentParser(object):
 
@@ -16,8 +18,12 @@ class TSSegmentParser(object):
     CONTAINER_MPEG_TS = 2
     CONTAINER_RAW_AAC = 3
 
-    def __init__(self, data ):
+    def __init__(self, data, paramSetCache=None, unwrapper=None):
         self.data = data
+        self.paramSetCache = paramSetCache
+        # Shared with the parsers of the following segments of the same
+        # variant so timestamps stay continuous across a 33-bit wrap
+        self.unwrapper = unwrapper if unwrapper is not None else TimestampUnwrapper()
         self.dataOffset = 0
         self.lastPts = 0
         self.containerType = self.CONTAINER_UNKNOWN
@@ -25,19 +31,42 @@ class TSSegmentParser(object):
         self.packetsCount = 0
         self.pmtId = -1
         self.tracks = dict()
+        self.firstPacketOffset = -1
+        self.packetScan = None
 
     def prepare(self):
         self._findContainerType()
 
         if self.containerType == self.CONTAINER_MPEG_TS:
+            self.firstPacketOffset = self.dataOffset
             self._readHeader()
             self.readSamples()
+            for track in self.tracks.values():
+                track.flush()
         else:
             dataParser = BitReader(self.data)
-            self.tracks[0] = PESReader(0, PESReader.TS_STREAM_TYPE_AAC)
+            self.tracks[0] = PESReader(0, PESReader.TS_STREAM_TYPE_AAC, self.paramSetCache, self.unwrapper)
             self.tracks[0].appendData(0, dataParser)
             self.tracks[0].payloadReader.consumeData(self.lastPts)
 
+    def getPacketIntegrity(self):
+        """
+        Continuity counter, TEI and duplicate packet check over the whole
+        segment (see ts_packets.scanPackets); None for raw AAC.
+        """
+        scan = self._scanPackets()
+        return scan.integrity if scan is not None else None
+
+    def getPCRTiming(self):
+        """PCRs and random access points of the segment; None for raw AAC."""
+        scan = self._scanPackets()
+        return scan.timing if scan is not None else None
+
+    def _scanPackets(self):
+        if self.packetScan is None and self.firstPacketOffset >= 0:
+            self.packetScan = scanPackets(TSPacketHeaders(self.data, self.firstPacketOffset))
+        return self.packetScan
+
     def getNumTracks(self):
         return len(self.tracks)
 
@@ -159,7 +188,7 @@ class TSSegmentParser(object):
             ES_info_length = packetParser.readBits(12)
             packetParser.skipBits(ES_info_length * 8)
             bytesRemaining -= ES_info_length + 5
-            self.tracks[elementaryPID] = PESReader(elementaryPID, streamType)
+            self.tracks[elementaryPID] = PESReader(elementaryPID, streamType, self.paramSetCache, self.unwrapper)
 
         self.pmtParsed = True
 
@@ -3,12 +3,197 @@
 # Use of this source code is governed by a MIT License
 # license that can be found in the LICENSE file.
 
-class VideoFramesInfo:
+from keyframe_stats import KeyframeStats
+from parsers.timestamp import ticksToSeconds
+
+FRAME_TYPES = ('I', 'P', 'B')
+
+# Per-segment dictionaries of VideoFrameInfo
+_SEGMENT_FIELDS = ('segmentsKeyframeStats', 'segmentsFirstFramePts', 'segmentsLastFramePts',
+                   'segmentsStartWithKeyframe', 'segmentsMuxRate', 'segmentsDuration',
+                   'segmentsFrameTypeCounts')
+
+
+class VideoFrameInfo(object):
+    """
+    Video statistics of one variant, as a mergeable summary.
+
+    Every figure is kept per segment index and the totals are derived from
+    them, so summaries of disjoint sets of segments can be merged in any order and grouping and
+    give the same result as adding the segments one by one to a single
+    instance. Workers can therefore summarize segment ranges of a variant
+    separately and combine the partial summaries afterwards. Keyframe
+    statistics are folded from the per-segment ones in segment order when
+    first read after a merge that is not in order; no keyframe interval is
+    counted across segments that were not analyzed. All timestamps and
+    intervals are in 90 kHz ticks.
+    """
 
     def __init__(self):
-        self.count = 0
-        self.lastKfi = 0
-        self.minKfi = 0
-        self.maxKfi = 0
-        self.lastKfPts = -1
-        self.segmentsFirstFramePts = dict()
+        # Keyframe statistics of each segment, keyed by segment index
+        self.segmentsKeyframeStats = {}
+
+        # PTS of the first and last video frame for each segment, keyed by segment index
+        self.segmentsFirstFramePts = {}
+        self.segmentsLastFramePts = {}
+
+        # Whether the first video frame of each segment is a keyframe, keyed by segment index
+        self.segmentsStartWithKeyframe = {}
+
+        # Measured TS mux rate (bits per second) for each segment, keyed by segment index
+        self.segmentsMuxRate = {}
+
+        # Duration of the video track of each segment, keyed by segment index
+        self.segmentsDuration = {}
+
+        # Frame counts by picture type (I, P, B) for each segment, keyed by segment index
+        self.segmentsFrameTypeCounts = {}
+
+        # Keyframe statistics over every segment, and the last segment index
+        # folded into them; None until read after an out of order merge
+        self._keyframeStats = KeyframeStats()
+        self._lastFolded = None
+
+    def add_segment(self, segment_index, frames, duration=0):
+        """
+        Add the video frames (parsers.frame.FrameTimeline) of a segment;
+        returns the keyframe statistics of that segment alone.
+        """
+        segment = VideoFrameInfo()
+        stats = KeyframeStats().add_timeline(frames, segment_index)
+        segment.segmentsKeyframeStats[segment_index] = stats
+        if frames:
+            segment.segmentsFirstFramePts[segment_index] = frames.pts[0]
+            segment.segmentsLastFramePts[segment_index] = frames.pts[-1]
+            segment.segmentsStartWithKeyframe[segment_index] = bool(frames.keyframes[0])
+        else:
+            segment.segmentsFirstFramePts[segment_index] = 0
+        segment.segmentsDuration[segment_index] = duration
+        segment.segmentsFrameTypeCounts[segment_index] = {
+            frameType: frames.types.count(frameType) for frameType in FRAME_TYPES}
+        self.merge(segment)
+        return stats
+
+    def merge(self, other):
+        """Add the segments summarized by `other`, none of which may be in this summary; returns self."""
+        overlap = self.segmentsKeyframeStats.keys() & other.segmentsKeyframeStats.keys()
+        if overlap:
+            raise ValueError("Segments {} are in both summaries".format(sorted(overlap)))
+
+        indexes = sorted(other.segmentsKeyframeStats)
+        if self._keyframeStats is not None and indexes and (self._lastFolded is None or indexes[0] > self._lastFolded):
+            for index in indexes:
+                self._keyframeStats.merge(other.segmentsKeyframeStats[index])
+            self._lastFolded = indexes[-1]
+        elif indexes:
+            self._keyframeStats = None
+
+        self.segmentsKeyframeStats.update(other.segmentsKeyframeStats)
+        self.segmentsFirstFramePts.update(other.segmentsFirstFramePts)
+        self.segmentsLastFramePts.update(other.segmentsLastFramePts)
+        self.segmentsStartWithKeyframe.update(other.segmentsStartWithKeyframe)
+        self.segmentsMuxRate.update(other.segmentsMuxRate)
+        self.segmentsDuration.update(other.segmentsDuration)
+        self.segmentsFrameTypeCounts.update(other.segmentsFrameTypeCounts)
+        return self
+
+    def segment(self, segment_index):
+        """Summary of the single segment `segment_index`."""
+        segment = VideoFrameInfo()
+        for name in _SEGMENT_FIELDS:
+            values = getattr(self, name)
+            if segment_index in values:
+                getattr(segment, name)[segment_index] = values[segment_index]
+        segment._keyframeStats = None
+        return segment
+
+    def to_state(self):
+        """JSON-serializable form of the summary, read back by from_state()."""
+        state = {name: [[index, value] for index, value in getattr(self, name).items()]
+                 for name in _SEGMENT_FIELDS if name != 'segmentsKeyframeStats'}
+        state['segmentsKeyframeStats'] = [[index, stats.to_state()]
+                                          for index, stats in self.segmentsKeyframeStats.items()]
+        return state
+
+    @classmethod
+    def from_state(cls, state, segment_index=None):
+        """
+        Summary saved by to_state(). `segment_index`, for the state of a
+        single segment, files it under that index instead of the saved one.
+        """
+        info = cls()
+        for name in _SEGMENT_FIELDS:
+            values = getattr(info, name)
+            for index, value in state.get(name, ()):
+                if segment_index is not None:
+                    index = segment_index
+                if name == 'segmentsKeyframeStats':
+                    value = KeyframeStats.from_state(value)
+                    value.first_segment = value.last_segment = index
+                values[index] = value
+        info._keyframeStats = None
+        return info
+
+    @property
+    def totalFrames(self):
+        return sum(stats.frames for stats in self.segmentsKeyframeStats.values())
+
+    @property
+    def totalSegments(self):
+        return len(self.segmentsKeyframeStats)
+
+    @property
+    def totalDuration(self):
+        return sum(self.segmentsDuration.values())
+
+    @property
+    def frameTypeCounts(self):
+        totals = dict.fromkeys(FRAME_TYPES, 0)
+        for counts in self.segmentsFrameTypeCounts.values():
+            for frameType, count in counts.items():
+                totals[frameType] = totals.get(frameType, 0) + count
+        return totals
+
+    @property
+    def keyframeStats(self):
+        """Keyframe positions and intervals over all the segments, in segment order."""
+        if self._keyframeStats is None:
+            stats = KeyframeStats()
+            for index in sorted(self.segmentsKeyframeStats):
+                stats.merge(self.segmentsKeyframeStats[index])
+            self._keyframeStats = stats
+            self._lastFolded = index if self.segmentsKeyframeStats else None
+        return self._keyframeStats
+
+    @property
+    def count(self):
+        return self.keyframeStats.count
+
+    @property
+    def minKfi(self):
+        return self.keyframeStats.min_interval
+
+    @property
+    def maxKfi(self):
+        return self.keyframeStats.max_interval
+
+    def to_dict(self):
+        return {
+            'segments_analyzed': len(self.segmentsFirstFramePts),
+            'keyframes': self.count,
+            'min_kfi': _seconds(self.minKfi),
+            'max_kfi': _seconds(self.maxKfi),
+            'keyframe_stats': self.keyframeStats.to_dict(),
+            'total_frames': self.totalFrames,
+            'total_duration': ticksToSeconds(self.totalDuration),
+            'frame_type_counts': self.frameTypeCounts,
+            'segments_first_frame_pts': {str(k): ticksToSeconds(v) for k, v in self.segmentsFirstFramePts.items()},
+            'segments_last_frame_pts': {str(k): ticksToSeconds(v) for k, v in self.segmentsLastFramePts.items()},
+            'segments_mux_rate': {str(k): v for k, v in self.segmentsMuxRate.items()},
+        }
+
+
+def _seconds(ticks):
+    if ticks is None:
+        return None
+    return ticksToSeconds(ticks)